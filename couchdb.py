@@ -5,13 +5,45 @@ Native Python 3.4 CouchDB 1.5.0 Client
 
  - requests.py (http://docs.python-requests.org/)
  - json (built in)
+ - gzip (built in)
 """
 
+import os
+import re
+import heapq
+import fnmatch
+import itertools
+import sys
+import math
+import array
+import gzip
+import base64
+import codecs
+import binascii
+import hashlib
 import uuid
 import string
 import json
+import sqlite3
+import argparse
+import contextlib
+import collections
+import threading
+import time
 import requests
 import datetime
+
+try:
+    import dataclasses
+except ImportError:
+    dataclasses = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from enum import Enum, unique
 
 
@@ -57,6 +89,196 @@ class CouchDBError(Exception):
     stack_trace = property(__get_stack_trace, __set_stack_trace)
 
 
+def _sequence_number(seq: object=None) -> int:
+    # CouchDB 2.x returns opaque string sequences which start with the numeric part
+    if isinstance(seq, int):
+        return seq
+    return int(str(seq).split("-")[0])
+
+
+class CouchDBCodecRegistry(object):
+    """
+    Maps Python types to and from CouchDB documents. Each type gets an encode and a decode function built once,
+    from its dataclass fields, __slots__ or __dict__, instead of inspecting every object as it is serialized.
+    Registered types are tagged with the type field so reads can turn documents back into instances.
+    """
+
+    __type_field = string
+    __encoders = dict
+    __decoders = dict
+    __names = dict
+    __lock = None
+
+    def __init__(self, type_field: string="doc_type"):
+        """
+        Initializes the codec registry
+
+        :param type_field: the document field holding the registered name of the encoded type
+        """
+        self.__type_field = type_field
+        self.__encoders = dict()
+        self.__decoders = dict()
+        self.__names = dict()
+        self.__lock = threading.Lock()
+
+    def register(self, cls: type=None, name: string=None, encoder=None, decoder=None) -> type:
+        """
+        Registers a type, usable as a class decorator
+
+        :param cls: the type to register
+        :param name: the name written to the type field, defaults to the class name
+        :param encoder: a callable turning an instance into a json serializable dict, built from the type if None
+        :param decoder: a callable turning a document dict into an instance, built from the type if None
+        :return: The registered type
+        """
+
+        if cls is None:
+            return lambda c: self.register(c, name=name, encoder=encoder, decoder=decoder)
+
+        name = cls.__name__ if name is None else name
+        fields = self.__fields_of(cls)
+
+        if encoder is None:
+            encoder = self.__compile_encoder(fields, "__dict__" in dir(cls))
+        if decoder is None:
+            decoder = self.__compile_decoder(cls, fields)
+
+        type_field = self.__type_field
+
+        def encode(o):
+            result = encoder(o)
+            result[type_field] = name
+            return result
+
+        with self.__lock:
+            self.__encoders[cls] = encode
+            self.__decoders[name] = decoder
+            self.__names[cls] = name
+
+        return cls
+
+    def encode(self, o: object=None) -> dict:
+        """
+        Encodes an object for json.dumps, suitable as its default argument. Unregistered types are encoded
+        from their attributes as before and their encoder is cached as well.
+
+        :param o: the object to encode
+        :return: A json serializable dictionary
+        """
+
+        encoder = self.__encoders.get(type(o))
+
+        if encoder is None:
+            fields = self.__fields_of(type(o))
+            encoder = self.__compile_encoder(fields, "__dict__" in dir(type(o))) if fields \
+                else lambda value: value.__dict__
+
+            with self.__lock:
+                self.__encoders.setdefault(type(o), encoder)
+
+        return encoder(o)
+
+    def decode(self, document: dict=None) -> object:
+        """
+        Decodes a document into an instance of the type named by its type field
+
+        :param document: the document dictionary
+        :return: An instance of the registered type, the document itself if its type is not registered
+        """
+
+        if not isinstance(document, dict):
+            return document
+
+        decoder = self.__decoders.get(document.get(self.__type_field))
+
+        if decoder is None:
+            return document
+
+        return decoder(document)
+
+    def dumps(self, value: object=None, **kwargs) -> string:
+        """
+        Serializes a value to json text, encoding objects through this registry
+
+        :param value: the value to serialize
+        :return: The json text
+        """
+
+        return json.dumps(value, default=self.encode, **kwargs)
+
+    def __decode_field(self, value: object=None) -> object:
+        if isinstance(value, dict) and self.__type_field in value:
+            return self.decode(value)
+        if isinstance(value, list):
+            return [self.__decode_field(item) for item in value]
+        return value
+
+    @staticmethod
+    def __fields_of(cls: type=None) -> list:
+        if dataclasses is not None and dataclasses.is_dataclass(cls):
+            return [field.name for field in dataclasses.fields(cls)]
+
+        slots = list()
+
+        for klass in cls.__mro__:
+            declared = klass.__dict__.get("__slots__", ())
+            declared = (declared,) if isinstance(declared, str) else declared
+            slots.extend(slot for slot in declared if slot not in ("__weakref__", "__dict__") and slot not in slots)
+
+        # plain classes keep their attributes in __dict__, which needs no field list, slots declared anywhere in
+        # the hierarchy are kept next to it
+        if not slots and "__dict__" in dir(cls):
+            return None
+
+        return slots
+
+    @staticmethod
+    def __compile_encoder(fields: list=None, keeps_dict: bool=False):
+        if fields is None:
+            return lambda o: dict(o.__dict__)
+
+        def encode(o):
+            result = dict(o.__dict__) if keeps_dict else dict()
+
+            for field in fields:
+                try:
+                    result[field] = getattr(o, field)
+                except AttributeError:
+                    pass
+
+            return result
+
+        return encode
+
+    def __compile_decoder(self, cls: type=None, fields: list=None):
+        decode_field = self.__decode_field
+
+        if dataclasses is not None and dataclasses.is_dataclass(cls):
+            init_fields = [field.name for field in dataclasses.fields(cls) if field.init]
+
+            def decode(document):
+                return cls(**dict((n, decode_field(document[n])) for n in init_fields if n in document))
+
+            return decode
+
+        any_field = fields is None or "__dict__" in dir(cls)
+
+        def decode(document):
+            result = cls.__new__(cls)
+
+            # reserved CouchDB fields such as _id and _rev stay on the CouchDBDocument
+            for key, value in document.items():
+                if not key.startswith("_") and (any_field or key in fields):
+                    setattr(result, key, decode_field(value))
+
+            return result
+
+        return decode
+
+
+default_codec_registry = CouchDBCodecRegistry()
+
+
 class CouchDB(object):
     committed_update_seq = int
     compact_running = bool
@@ -82,13 +304,29 @@ class CouchDBDocument(object):
     conflicts = None
     deleted_conflicts = None
     local_seq = None
+    value = None
 
     def __get_json_text(self):
-        return json.dumps(self.json, default=lambda o: o.__dict__, sort_keys=True, indent="\t")
+        return default_codec_registry.dumps(self.json, sort_keys=True, indent="\t")
 
     json_text = property(__get_json_text)
 
 
+class CouchDBAttachment(object):
+    name = string
+    content_type = string
+    data = bytes
+    digest = string
+    length = int
+
+    def __init__(self, name: string=None, data: bytes=None, content_type: string="application/octet-stream"):
+        self.name = name
+        self.data = data
+        self.content_type = content_type
+        self.digest = None
+        self.length = None if data is None else len(data)
+
+
 @unique
 class RevisionInfoStatus(Enum):
     Available = "available"
@@ -102,435 +340,3455 @@ class RevisionInfo(object):
     status = RevisionInfoStatus
 
 
-class NativeCouchDBManager(object):
-    # region Instance Fields
-    __name = string
-    __user = string
-    __password = string
-    __host = string
-    __port = int
-    __full_commit = bool
-    __auth_method = string
-    __verify = bool
-    __generate_uuid_from_couch = bool
-    __supported_version = "1.5.0"
-    __throw_errors = bool
-    # endregion
+class CouchDBColumns(object):
+    """
+    Result rows decoded straight into one column per field. Numbers and booleans are kept in typed arrays, strings
+    are interned so repeated values share one object, and rows can be appended as pages arrive.
+    """
 
-    def __init__(self,
-                 db_name: string="db-test",
-                 db_user: string=None,
-                 db_password: string=None,
-                 db_host_ip: string="127.0.0.1",
-                 db_host_port: int=5984,
-                 db_full_commit: bool=True,
-                 db_auth_method: string="basic",
-                 db_verify: bool=False,
-                 db_generated_uuid_from_couch_db: bool=True,
-                 db_throw_errors: bool=False):
+    __fields = list
+    __paths = list
+    __columns = dict
+    __count = int
+
+    def __init__(self, fields: list=None):
         """
-        Initializes the CouchDB manager
+        Initializes an empty result
 
-        :param db_name: the name of the database
-        :param db_user: the user to use when accessing the database
-        :param db_password: the password for the user
-        :param db_host_ip: the ip address of the couch db server
-        :param db_host_port: the port of the couch db server
-        :param db_full_commit:
-        :param db_auth_method: the authentication method to use
-        :param db_verify:
-        :param db_generated_uuid_from_couch_db: generate uuids internally or through couchdb
-        :param db_throw_errors: throw errors or suppress them
+        :param fields: A list of dotted paths into each row naming the columns, such as "id", "value.rev" or
+        "doc.amount", list items are addressed by their position such as "changes.0.rev"
         """
-        self.__name = db_name
-        self.__user = db_user
-        self.__password = db_password
-        self.__host = db_host_ip
-        self.__port = db_host_port
-        self.__full_commit = db_full_commit
-        self.__auth_method = db_auth_method
-        self.__verify = db_verify
-        self.__generate_uuid_from_couch = db_generated_uuid_from_couch_db
-        self.__throw_errors = db_throw_errors
 
-    def __get_command_text(self, cmd: string=None) -> string:
-        return "http://" + self.__host + ":" + self.__port.__str__() + cmd
+        self.__fields = list(fields)
+        self.__paths = [field.split(".") for field in self.__fields]
+        self.__columns = {field: None for field in self.__fields}
+        self.__count = 0
 
-    # region Not Implemented
+    def __get_fields(self) -> list:
+        return list(self.__fields)
 
-    # def retrieve_current_document_revision(self, database_name, doc_id):
-    #     # HEAD /somedatabase/some_doc_id HTTP/1.0
-    #
-    #     # HTTP/1.1 200 OK
-    #     # Etag: "946B7D1C"
-    #     # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
-    #     # Content-Type: application/json
-    #     # Content-Length: 256
-    #     pass
+    fields = property(__get_fields)
 
-    # GET /somedatabase/_changes HTTP/1.0
+    def __len__(self) -> int:
+        return self.__count
 
-    # HTTP/1.1 200 OK
-    # Date: Fri, 8 May 2009 11:07:02 +0000GMT
-    # Content-Type: application/json
-    # Connection: close
-    #
-    # {"results":[
-    # {"seq":1,"id":"fresh","changes":[{"rev":"1-967a00dff5e02add41819138abb3284d"}]},
-    # {"seq":3,"id":"updated","changes":[{"rev":"2-7051cbe5c8faecd085a3fa619e6e6337"}]},
-    # {"seq":5,"id":"deleted","changes":[{"rev":"2-eec205a9d413992850a6e32678485900"}],"deleted":true}
-    # ],
-    # "last_seq":5}
+    def __getitem__(self, field: string=None) -> object:
+        column = self.__columns[field]
 
-    # def retrieve_document_revision(self, database_name: string=None, doc_id: string=None):
-    #     pass
+        if column is None:
+            return [None] * self.__count
 
-    #endregion
+        return column
 
-    def retrieve_uuid(self, count: int=None) -> string:
+    def append(self, row: dict=None):
         """
-        Retrieves / Generates a UUID from CouchDB. If one cannot be generating
+        Adds a row to the columns
 
-        :param count: An integer representing the number of UUIDs to retrieve
-        :return: A string of a UUID if count is None, A list of UUIDs if count is not None, None otherwise
+        :param row: A result row dictionary
         """
 
-        #region Sample Req/Resp
-        #curl -X GET http://127.0.0.1:5984/_uuids
-
-        #{"uuids":["6e1295ed6c29495e54cc05947f18c8af"]}
-        #endregion
-
-        result = None
+        for field, path in zip(self.__fields, self.__paths):
+            value = row
 
-        if not self.__generate_uuid_from_couch:
-            result = uuid.uuid1().__str__()
-        else:
-            command_text = self.__get_command_text("/_uuids")
-            payload = {"count": count}
-            req = requests.get(command_text, params=payload)
-            status_code = req.status_code
+            for part in path:
+                if isinstance(value, dict):
+                    value = value.get(part)
+                elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                    value = value[int(part)]
+                else:
+                    value = None
+                    break
 
-            if status_code == 200:
+            self.__append(field, value)
 
-                json_result = req.json()
+        self.__count += 1
 
-                if count is None:
-                    result = json_result["uuids"][0]
-                else:
-                    result = json_result["uuids"]
+    def extend(self, rows: object=None):
+        """
+        Adds many rows to the columns
 
-            else:
-                if self.__throw_errors is True:
-                    cdb_error = CouchDBError()
-                    cdb_error.title = "Failed to retrieve a uuid from CouchDB"
-                    raise cdb_error
-                else:
-                    result = uuid.uuid1().__str__()
+        :param rows: An iterable of result row dictionaries, such as a page or a streaming generator
+        """
 
-        return result
+        for row in rows:
+            self.append(row)
 
-    def retrieve_status(self) -> string:
+    def to_numpy(self, field: string=None) -> object:
         """
-        Retrieves the current status of Couch DB.
+        Copies a numeric column into a NumPy array for vectorized work, other columns are returned as they are
 
-        :return: None if not available otherwise the version of Couch DB as a string
+        :param field: The name of the column
+        :return: A NumPy array when NumPy is installed and the column is numeric, otherwise the column itself
         """
 
-        #region Sample Req/Resp
-        # http://127.0.0.1:5984/
+        column = self[field]
 
-        # {
-        #   "couchdb": "Welcome",
-        #   "uuid": "85fb71bf700c17267fef77535820e371",
-        #   "vendor": {
-        #       "name": "The Apache Software Foundation",
-        #       "version": "1.5.0"
-        #   },
-        #   "version": "1.5.0"
-        # }
-        #endregion
+        if numpy is None or not isinstance(column, array.array):
+            return column
 
-        connect_string = self.__get_command_text("")
-        req = requests.get(connect_string)
-        status_code = req.status_code
-        reason = req.reason
+        return numpy.frombuffer(column, dtype=numpy.dtype(column.typecode)).copy()
 
-        if status_code == 200 and reason == "OK":
-            json_result = req.json()
-            version = json_result['version']
-        else:
-            if self.__throw_errors is True:
-                cdb_error = CouchDBError()
-                cdb_error.title = "Unable to get the CouchDB server status"
-                raise cdb_error
+    def __append(self, field: string=None, value: object=None):
+        column = self.__columns[field]
+
+        if column is None:
+            if value is None:
+                return
+
+            # the type is taken from the first value, rows without one so far become missing values
+            if isinstance(value, bool):
+                column = array.array("b") if self.__count == 0 else [None] * self.__count
+            elif isinstance(value, int) and self.__count == 0:
+                column = array.array("q")
+            elif isinstance(value, (int, float)):
+                column = array.array("d", [float("nan")] * self.__count)
             else:
-                version = None
+                column = [None] * self.__count
+
+            self.__columns[field] = column
+
+        if isinstance(value, str):
+            value = sys.intern(value)
+
+        if isinstance(column, array.array):
+            try:
+                if column.typecode == "b" and isinstance(value, bool):
+                    column.append(value)
+                    return
+                if column.typecode == "q" and isinstance(value, int) and not isinstance(value, bool):
+                    column.append(value)
+                    return
+                if column.typecode == "d" and (value is None or isinstance(value, (int, float))) \
+                        and not isinstance(value, bool):
+                    column.append(float("nan") if value is None else value)
+                    return
+            except OverflowError:
+                pass
 
-        return version
+            # a value the array cannot hold widens integers to doubles and anything else to a plain list
+            if column.typecode == "q" and (value is None or isinstance(value, float)):
+                column = array.array("d", column)
+            elif column.typecode == "b":
+                # booleans are stored as 0 and 1, tolist() would hand them back as integers
+                column = [bool(item) for item in column]
+            else:
+                column = column.tolist()
 
-    def create_database(self, database_name: string=None) -> bool:
+            self.__columns[field] = column
+            self.__append(field, value)
+            return
+
+        column.append(value)
+
+
+class CouchDBRowReader(object):
+    """
+    Decodes the rows or results array of a streamed response one row at a time as the bytes arrive, so the first
+    row is usable before the page has downloaded and only one row is held in memory. The other members of the
+    response, such as total_rows, offset and last_seq, are collected into metadata.
+    """
+
+    __response = None
+    __field = string
+    __metadata = dict
+    __chunks = None
+    __decoder = None
+    __json_decoder = None
+    __buffer = string
+    __position = int
+    __eof = bool
+
+    def __init__(self, response: requests.Response=None, field: string=None, chunk_size: int=65536):
         """
-        Creates a database in CoucbDB
+        Initializes the reader over a response sent with stream=True
 
-        :param database_name: The name to give to the new CouchDB database
-        :return: True if created, False if already exists, None if unknown
+        :param response: The streamed response
+        :param field: The name of the array to stream, None for rows or results, whichever comes first
+        :param chunk_size: An integer setting the number of bytes read from the socket at a time
         """
 
-        #region Sample Req/Resp
-        #PUT http://127.0.0.1:5984/database_name
+        self.__response = response
+        self.__field = field
+        self.__metadata = dict()
+        self.__chunks = response.iter_content(chunk_size)
+        self.__decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__json_decoder = json.JSONDecoder()
+        self.__buffer = ""
+        self.__position = 0
+        self.__eof = False
 
-        #{"ok":true}
-        #{"error":"file_exists","reason":"The database could not be created, the file already exists."}
-        #endregion
+    def __get_metadata(self) -> dict:
+        return self.__metadata
 
-        result = None
-        command_text = self.__get_command_text("/" + database_name)
-        req = requests.put(command_text)
-        status_code = req.status_code
+    metadata = property(__get_metadata)
 
-        if status_code == 201 or status_code == 200:
-            #201 Created – Database created successfully
-            result = True
-        else:
-            json_result = req.json()
-            result = False
-            error = json_result["error"]
-            reason = json_result["reason"]
+    def __iter__(self):
+        try:
+            self.__expect("{")
 
-            if self.__throw_errors is True:
+            while True:
+                token = self.__skip()
 
-                cdb_error = CouchDBError()
-                cdb_error.description = "[" + error + "] " + reason
+                if token == "}":
+                    return
+                if token == ",":
+                    self.__position += 1
+                    continue
 
-                if status_code == 400:
-                    cdb_error.title = "400 Bad Request – Invalid database name"
-                elif status_code == 401:
-                    cdb_error.title = "401 Unauthorized – CouchDB Server Administrator privileges required"
-                elif status_code == 412:
-                    cdb_error.title = "412 Precondition Failed – Database already exists"
-                else:
-                    cdb_error.title = "An unknown status code was encountered : " + status_code
+                key = self.__value()
+                self.__expect(":")
 
-                raise cdb_error
+                if key == self.__field or (self.__field is None and key in ("rows", "results")):
+                    self.__expect("[")
 
-        return result
+                    while True:
+                        token = self.__skip()
 
-    def delete_database(self, database_name: string=None) -> bool:
-        """
-        Deletes a database in CouchDB
+                        if token == "]":
+                            self.__position += 1
+                            break
+                        if token == ",":
+                            self.__position += 1
+                            continue
 
-        :param database_name: A string representation of the database name to be deleted
-        :return: True if deleted, False if not, otherwise None for unknown
+                        yield self.__value()
+                else:
+                    self.__metadata[key] = self.__value()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Releases the connection of the response, rows not read yet are discarded
         """
 
-        #region Sample Req/Resp
-        #DELETE http://127.0.0.1:5984/database_name
+        self.__response.close()
 
-        #{"ok":true}
-        #endregion
+    def __fill(self) -> bool:
+        # the consumed part of the buffer is dropped whenever more is read
+        if self.__eof:
+            return False
 
-        result = None
-        command_text = self.__get_command_text("/" + database_name)
-        req = requests.delete(command_text)
-        status_code = req.status_code
+        chunk = next(self.__chunks, None)
+        self.__buffer = self.__buffer[self.__position:]
+        self.__position = 0
 
-        if status_code == 200:
-            #200 OK – Database removed successfully
-            result = True
-        else:
-            json_result = req.json()
-            result = False
-            error = json_result["error"]
+        if chunk is None:
+            self.__eof = True
+            self.__buffer += self.__decoder.decode(b"", final=True)
+            return False
+
+        self.__buffer += self.__decoder.decode(chunk)
+        return True
+
+    def __skip(self) -> string:
+        while True:
+            while self.__position < len(self.__buffer) and self.__buffer[self.__position] in " \t\r\n":
+                self.__position += 1
+
+            if self.__position < len(self.__buffer):
+                return self.__buffer[self.__position]
+
+            if not self.__fill():
+                raise ValueError("Unexpected end of the response body")
+
+    def __expect(self, token: string=None):
+        if self.__skip() != token:
+            raise ValueError("Expected " + token + " in the response body at " + self.__buffer[self.__position:][:20])
+
+        self.__position += 1
+
+    def __value(self) -> object:
+        self.__skip()
+
+        while True:
+            try:
+                value, end = self.__json_decoder.raw_decode(self.__buffer, self.__position)
+
+                # a value ending with the buffer may be a number cut short, unless the body is complete
+                if end < len(self.__buffer) or self.__eof:
+                    self.__position = end
+                    return value
+            except ValueError:
+                if self.__eof:
+                    raise
+
+            self.__fill()
+
+
+class CouchDBTransferCheckpoint(object):
+    """
+    Thread safe progress record for a database export or import, persisted as json so an interrupted
+    transfer can resume from the last completed page or batch of each shard
+    """
+
+    __path = string
+    __state = dict
+    __lock = None
+
+    def __init__(self, path: string=None):
+        self.__path = path
+        self.__state = dict()
+        self.__lock = threading.Lock()
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                self.__state = json.load(f)
+
+    def retrieve(self, shard: int=None) -> dict:
+        with self.__lock:
+            return dict(self.__state.get(str(shard), dict()))
+
+    def update(self, shard: int=None, **values):
+        with self.__lock:
+            self.__state.setdefault(str(shard), dict()).update(values)
+
+            if self.__path is not None:
+                temp_path = self.__path + ".tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(self.__state, f, sort_keys=True)
+                os.replace(temp_path, self.__path)
+
+
+class CouchDBIdFilter(object):
+    """
+    A Bloom filter of the document IDs known to exist in a database, an ID it does not contain is certainly new
+    while an ID it contains probably exists and has to be verified
+    """
+
+    __bits = None
+    __size = int
+    __hash_count = int
+    __count = int
+    __lock = None
+    last_seq = None
+
+    def __init__(self, capacity: int=100000, false_positive_rate: float=0.01, max_bytes: int=None):
+        """
+        Initializes an empty filter sized for the expected number of IDs
+
+        :param capacity: the number of IDs the filter is expected to hold
+        :param false_positive_rate: the chance an unknown ID is reported as probably existing once full
+        :param max_bytes: the most memory the filter may use, trading a higher false positive rate for less memory
+        """
+
+        capacity = max(1, capacity)
+        size = int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+
+        if max_bytes is not None:
+            size = min(size, max_bytes * 8)
+
+        self.__size = max(8, size)
+        self.__hash_count = max(1, int(round(self.__size / capacity * math.log(2))))
+        self.__bits = bytearray((self.__size + 7) // 8)
+        self.__count = 0
+        self.__lock = threading.Lock()
+
+    def __get_count(self) -> int:
+        return self.__count
+
+    def __get_size_bytes(self) -> int:
+        return len(self.__bits)
+
+    def __get_false_positive_rate(self) -> float:
+        return (1.0 - math.exp(-self.__hash_count * self.__count / self.__size)) ** self.__hash_count
+
+    count = property(__get_count)
+    size_bytes = property(__get_size_bytes)
+    false_positive_rate = property(__get_false_positive_rate)
+
+    def __positions(self, doc_id: string=None):
+        # double hashing derives every position from the two halves of a single md5
+        digest = hashlib.md5(doc_id.encode("utf-8")).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        for i in range(self.__hash_count):
+            yield (first + i * second) % self.__size
+
+    def add(self, doc_id: string=None):
+        """
+        Adds a document ID to the filter
+
+        :param doc_id: The document ID
+        """
+
+        with self.__lock:
+            added = False
+
+            for position in self.__positions(doc_id):
+                if not self.__bits[position >> 3] & (1 << (position & 7)):
+                    self.__bits[position >> 3] |= 1 << (position & 7)
+                    added = True
+
+            if added:
+                self.__count += 1
+
+    def __contains__(self, doc_id: string=None) -> bool:
+        return all(self.__bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(doc_id))
+
+
+class CouchDBNode(object):
+    host = string
+    port = int
+    healthy = bool
+    latency = float
+    failures = int
+    ejected_until = float
+    requests = int
+
+    def __init__(self, host: string=None, port: int=5984):
+        self.host = host
+        self.port = port
+        self.healthy = True
+        self.latency = None
+        self.failures = 0
+        self.ejected_until = None
+        self.requests = 0
+
+    def __get_base_url(self) -> string:
+        return "http://" + self.host + ":" + self.port.__str__()
+
+    base_url = property(__get_base_url)
+
+
+class CouchDBNodePool(object):
+    """
+    Tracks the health and latency of the nodes of a CouchDB cluster. Reads go to the fastest healthy node, writes
+    follow the write policy, and nodes failing repeatedly are ejected until a health check readmits them.
+    """
+
+    write_policies = ("primary", "round_robin", "lowest_latency")
+
+    __nodes = list
+    __write_policy = string
+    __failure_threshold = int
+    __ejection_time = float
+    __health_check_interval = float
+    __next_write = int
+    __lock = None
+    __pinned = None
+    __stopped = None
+    __thread = None
+
+    def __init__(self,
+                 nodes: list=None,
+                 write_policy: string="primary",
+                 failure_threshold: int=3,
+                 ejection_time: float=30.0,
+                 health_check_interval: float=10.0):
+        """
+        Initializes the node pool
+
+        :param nodes: a list of "host:port" strings or (host, port) tuples
+        :param write_policy: primary (first healthy node), round_robin or lowest_latency
+        :param failure_threshold: the number of consecutive failures after which a node is ejected
+        :param ejection_time: the minimum number of seconds an ejected node is kept out of rotation
+        :param health_check_interval: the number of seconds between health checks, None to disable them
+        """
+        if write_policy not in self.write_policies:
+            raise ValueError("Unknown write policy : " + write_policy)
+
+        self.__nodes = list()
+
+        for node in nodes:
+            if isinstance(node, str):
+                host, _, port = node.partition(":")
+                node = (host, int(port) if port else 5984)
+            self.__nodes.append(CouchDBNode(host=node[0], port=node[1]))
+
+        self.__write_policy = write_policy
+        self.__failure_threshold = failure_threshold
+        self.__ejection_time = ejection_time
+        self.__health_check_interval = health_check_interval
+        self.__next_write = 0
+        self.__lock = threading.Lock()
+        self.__pinned = threading.local()
+        self.__stopped = threading.Event()
+
+    def __get_nodes(self) -> list:
+        return list(self.__nodes)
+
+    def __get_pinned(self) -> bool:
+        return getattr(self.__pinned, "node", None) is not None
+
+    nodes = property(__get_nodes)
+    pinned = property(__get_pinned)
+
+    def select(self, method: string=None, exclude: list=None) -> CouchDBNode:
+        """
+        Selects the node a request is sent to
+
+        :param method: the http method of the request
+        :param exclude: a list of nodes that already failed for this request
+        :return: The selected CouchDBNode
+        """
+
+        pinned = getattr(self.__pinned, "node", None)
+
+        if pinned is not None:
+            return pinned
+
+        with self.__lock:
+            now = time.time()
+            # an ejected node whose ejection time has passed gets trial requests until it succeeds or fails again
+            candidates = [n for n in self.__nodes
+                          if (n.healthy or now >= n.ejected_until) and (exclude is None or n not in exclude)]
+
+            if len(candidates) == 0:
+                # with every node ejected the one ejected longest ago is the best remaining guess
+                candidates = [n for n in self.__nodes if exclude is None or n not in exclude] or self.__nodes
+                candidates = sorted(candidates, key=lambda n: n.ejected_until or 0)[:1]
+
+            if method in ("GET", "HEAD") or self.__write_policy == "lowest_latency":
+                result = min(candidates, key=lambda n: n.latency if n.latency is not None else 0)
+            elif self.__write_policy == "round_robin":
+                result = candidates[self.__next_write % len(candidates)]
+                self.__next_write += 1
+            else:
+                result = candidates[0]
+
+            result.requests += 1
+
+        return result
+
+    def report(self, node: CouchDBNode=None, latency: float=None, succeeded: bool=True):
+        """
+        Records the outcome of a request sent to a node
+
+        :param node: the node the request was sent to
+        :param latency: the number of seconds the request took
+        :param succeeded: False if the node did not respond or answered with a server error
+        """
+
+        with self.__lock:
+            if succeeded:
+                node.healthy = True
+                node.failures = 0
+                node.ejected_until = None
+                # exponentially weighted so a single slow request does not move all reads away
+                node.latency = latency if node.latency is None else 0.8 * node.latency + 0.2 * latency
+            else:
+                node.failures += 1
+
+                # a failed trial request sends an ejected node back out for another ejection time
+                if node.failures >= self.__failure_threshold:
+                    node.healthy = False
+                    node.ejected_until = time.time() + self.__ejection_time
+
+    def check(self, manager: object=None):
+        """
+        Health checks every node with retrieve_status, readmitting ejected nodes once they respond again
+
+        :param manager: the manager used to reach the nodes
+        """
+
+        for node in self.__nodes:
+            started = time.time()
+            self.__pinned.node = node
+
+            try:
+                version = manager.retrieve_status()
+            except (CouchDBError, requests.RequestException):
+                version = None
+            finally:
+                self.__pinned.node = None
+
+            with self.__lock:
+                if version is None:
+                    node.failures = max(node.failures, self.__failure_threshold)
+                    node.healthy = False
+                    node.ejected_until = time.time() + self.__ejection_time
+                else:
+                    node.healthy = True
+                    node.failures = 0
+                    node.ejected_until = None
+                    latency = time.time() - started
+                    node.latency = latency if node.latency is None else 0.8 * node.latency + 0.2 * latency
+
+    def start(self, manager: object=None):
+        """
+        Starts health checking on a background thread
+
+        :param manager: the manager used to reach the nodes
+        """
+
+        if self.__health_check_interval is None:
+            return
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, args=(manager,), name="couchdb-node-health-check")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the background health checks
+        """
+
+        self.__stopped.set()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __run(self, manager: object=None):
+        while not self.__stopped.wait(self.__health_check_interval):
+            self.check(manager)
+
+
+class CouchDBAttachmentCache(object):
+    """
+    On disk cache of attachment contents keyed by their CouchDB digest. Contents with the same digest are
+    identical, so entries never go stale; the least recently used ones are evicted once the size cap is reached.
+    """
+
+    __directory = string
+    __max_size = int
+    __max_names = int
+    __size = int
+    __entries = None
+    __names = None
+    __lock = None
+
+    def __init__(self, directory: string=None, max_size: int=268435456, max_names: int=100000):
+        """
+        Initializes the attachment cache, picking up the entries a previous instance left in the directory
+
+        :param directory: the directory the cached attachments are stored in
+        :param max_size: the total size in bytes the cached attachments may take up
+        :param max_names: the number of attachment name to digest mappings remembered
+        """
+        self.__directory = directory
+        self.__max_size = max_size
+        self.__max_names = max_names
+        self.__size = 0
+        self.__entries = collections.OrderedDict()
+        self.__names = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        files = [os.path.join(directory, name) for name in os.listdir(directory) if name.startswith("md5-")]
+
+        for path in sorted(files, key=os.path.getmtime):
+            size = os.path.getsize(path)
+            self.__entries[os.path.basename(path)] = size
+            self.__size += size
+
+    @staticmethod
+    def digest_of(data: bytes=None) -> string:
+        """
+        Computes the digest CouchDB reports for an attachment it stores uncompressed, the digest of a compressed
+        attachment covers its stored encoding instead
+
+        :param data: the attachment contents
+        :return: A string of the form md5-<base64 md5>
+        """
+
+        return "md5-" + base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+    def retrieve(self, digest: string=None) -> bytes:
+        """
+        Retrieves cached attachment contents
+
+        :param digest: the digest of the attachment
+        :return: The attachment contents if cached, None otherwise
+        """
+
+        key = self.__key(digest)
+
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+
+            self.__entries.move_to_end(key)
+
+        try:
+            with open(os.path.join(self.__directory, key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self.__lock:
+                self.__size -= self.__entries.pop(key, 0)
+            return None
+
+    def store(self, digest: string=None, data: bytes=None):
+        """
+        Stores attachment contents, evicting the least recently used entries beyond the size cap
+
+        :param digest: the digest of the attachment
+        :param data: the attachment contents
+        """
+
+        key = self.__key(digest)
+
+        if len(data) > self.__max_size:
+            return
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                return
+
+        path = os.path.join(self.__directory, key)
+        temp_path = path + "." + uuid.uuid4().hex + ".tmp"
+
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self.__lock:
+            if key not in self.__entries:
+                self.__entries[key] = len(data)
+                self.__size += len(data)
+
+            while self.__size > self.__max_size:
+                evicted, size = self.__entries.popitem(last=False)
+                self.__size -= size
+
+                try:
+                    os.remove(os.path.join(self.__directory, evicted))
+                except OSError:
+                    pass
+
+    def remember(self, name: tuple=None, digest: string=None):
+        """
+        Remembers the digest of an attachment so later reads can find it in the cache without asking CouchDB
+
+        :param name: a (database name, doc id, rev id, attachment name) tuple, rev id None for the latest revision
+        :param digest: the digest of the attachment
+        """
+
+        with self.__lock:
+            self.__names[name] = digest
+            self.__names.move_to_end(name)
+
+            while len(self.__names) > self.__max_names:
+                self.__names.popitem(last=False)
+
+    def lookup(self, name: tuple=None) -> string:
+        """
+        Looks up the digest remembered for an attachment
+
+        :param name: a (database name, doc id, rev id, attachment name) tuple
+        :return: The digest if known, None otherwise
+        """
+
+        with self.__lock:
+            return self.__names.get(name)
+
+    @staticmethod
+    def __key(digest: string=None) -> string:
+        # base64 may contain "/" so the md5 is stored hex encoded
+        algorithm, _, encoded = digest.partition("-")
+        return algorithm + "-" + binascii.hexlify(base64.b64decode(encoded)).decode("ascii")
+
+
+class CouchDBConcurrencyLimiter(object):
+    """
+    Limits the number of requests in flight, adapting the limit with additive increase and multiplicative
+    decrease. The limit grows while the recent latency of each class of request stays near its long term average
+    and shrinks when it climbs past the tolerance or CouchDB answers 429 or 503. Classes keep small reads from
+    making large bulk requests look like overload.
+    """
+
+    __limit = float
+    __min_limit = int
+    __max_limit = int
+    __latency_tolerance = float
+    __backoff = float
+    __in_flight = int
+    __baselines = dict
+    __smoothed_latencies = dict
+    __last_decrease = float
+    __decreases = int
+    __waits = int
+    __condition = None
+
+    def __init__(self,
+                 initial_limit: int=8,
+                 min_limit: int=1,
+                 max_limit: int=256,
+                 latency_tolerance: float=2.0,
+                 backoff: float=0.5):
+        """
+        Initializes the concurrency limiter
+
+        :param initial_limit: the number of requests allowed in flight at first
+        :param min_limit: the lowest the limit is reduced to
+        :param max_limit: the highest the limit is raised to
+        :param latency_tolerance: how many times the long term latency the recent latency may reach before the limit
+        shrinks
+        :param backoff: the factor the limit is multiplied by when the server is overloaded
+        """
+        self.__limit = float(initial_limit)
+        self.__min_limit = min_limit
+        self.__max_limit = max_limit
+        self.__latency_tolerance = latency_tolerance
+        self.__backoff = backoff
+        self.__in_flight = 0
+        self.__baselines = dict()
+        self.__smoothed_latencies = dict()
+        self.__last_decrease = 0.0
+        self.__decreases = 0
+        self.__waits = 0
+        self.__condition = threading.Condition()
+
+    def __get_limit(self) -> int:
+        return int(self.__limit)
+
+    limit = property(__get_limit)
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent
+        """
+
+        with self.__condition:
+            if self.__in_flight >= int(self.__limit):
+                self.__waits += 1
+
+            while self.__in_flight >= int(self.__limit):
+                self.__condition.wait()
+
+            self.__in_flight += 1
+
+    def release(self, latency: float=None, status_code: int=None, request_class: string=None):
+        """
+        Records the outcome of a request and adapts the limit
+
+        :param latency: the number of seconds the request took
+        :param status_code: the http status code, None if the request failed without a response
+        :param request_class: the kind of request, such as "GET _all_docs", latencies are only compared within it
+        """
+
+        with self.__condition:
+            self.__in_flight -= 1
+
+            # the baseline is a slow average so it absorbs the normal spread of latencies and follows the server
+            # when it gets slower for good, the fast average catches a rise so a single slow request does not count
+            baseline = self.__baselines.get(request_class)
+            smoothed = self.__smoothed_latencies.get(request_class)
+
+            if baseline is None:
+                baseline = latency
+            else:
+                baseline = 0.99 * baseline + 0.01 * latency
+
+            if smoothed is None:
+                smoothed = latency
+            else:
+                smoothed = 0.9 * smoothed + 0.1 * latency
+
+            self.__baselines[request_class] = baseline
+            self.__smoothed_latencies[request_class] = smoothed
+
+            overloaded = status_code is None or status_code == 429 or status_code == 503 or \
+                smoothed > baseline * self.__latency_tolerance
+            now = time.time()
+
+            if overloaded:
+                # requests that were in flight together report the same overload, shrink once per round trip
+                if now - self.__last_decrease > latency:
+                    self.__limit = max(float(self.__min_limit), self.__limit * self.__backoff)
+                    self.__last_decrease = now
+                    self.__decreases += 1
+            else:
+                self.__limit = min(float(self.__max_limit), self.__limit + 1.0 / self.__limit)
+
+            self.__condition.notify_all()
+
+    def retrieve_statistics(self) -> dict:
+        """
+        Retrieves the current state of the limiter
+
+        :return: A dictionary with the limit, in flight requests, decreases, waits and the baseline and smoothed
+        latency of every request class
+        """
+
+        with self.__condition:
+            result = {"concurrency.limit": int(self.__limit),
+                      "concurrency.in_flight": self.__in_flight,
+                      "concurrency.decreases": self.__decreases,
+                      "concurrency.waits": self.__waits}
+
+            for request_class, baseline in self.__baselines.items():
+                result["concurrency.baseline_latency." + str(request_class)] = baseline
+                result["concurrency.latency." + str(request_class)] = self.__smoothed_latencies[request_class]
+
+            return result
+
+
+class CouchDBSingleFlight(object):
+    """
+    Coalesces identical calls made at the same time: the first caller for a key does the work and every caller
+    that arrives while it is in flight waits for and shares its result
+    """
+
+    __calls = dict
+    __lock = None
+    __leaders = int
+    __coalesced = int
+
+    def __init__(self):
+        self.__calls = dict()
+        self.__lock = threading.Lock()
+        self.__leaders = 0
+        self.__coalesced = 0
+
+    def do(self, key: object=None, fn=None) -> object:
+        """
+        Calls fn, unless a call with the same key is in flight, in which case its outcome is shared
+
+        :param key: a hashable key identifying identical calls
+        :param fn: a callable without arguments doing the work
+        :return: The result of the call, exceptions are raised in every caller sharing it
+        """
+
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.__calls[key] = call
+                self.__leaders += 1
+            else:
+                self.__coalesced += 1
+
+        if leader:
+            try:
+                call["result"] = fn()
+            except BaseException as e:
+                call["error"] = e
+            finally:
+                with self.__lock:
+                    del self.__calls[key]
+
+                call["done"].set()
+        else:
+            call["done"].wait()
+
+        if call["error"] is not None:
+            raise call["error"]
+
+        return call["result"]
+
+    def retrieve_statistics(self) -> dict:
+        """
+        Retrieves how many calls were made and how many of them were coalesced into another
+
+        :return: A dictionary with the leader and coalesced call counts
+        """
+
+        with self.__lock:
+            return {"single_flight.requests": self.__leaders, "single_flight.coalesced": self.__coalesced}
+
+
+class CouchDBPriorityScheduler(object):
+    """
+    Splits the requests of a manager into priority lanes, each with its own budget of requests in flight. A freed
+    slot always goes to the highest priority lane that has requests waiting, so batch work cannot starve
+    interactive requests.
+    """
+
+    __lanes = list
+    __budgets = dict
+    __limit = int
+    __in_flight = dict
+    __waiting = dict
+    __total_in_flight = int
+    __condition = None
+    __statistics = dict
+
+    def __init__(self, lanes: list=None, limit: int=None):
+        """
+        Initializes the scheduler
+
+        :param lanes: A list of (name, budget) tuples from the highest priority to the lowest, defaults to an
+        interactive lane of 8 requests and a batch lane of 4
+        :param limit: the most requests in flight over every lane, defaults to the sum of the budgets
+        """
+
+        lanes = [("interactive", 8), ("batch", 4)] if lanes is None else lanes
+
+        self.__lanes = [name for name, budget in lanes]
+        self.__budgets = dict(lanes)
+        self.__limit = sum(self.__budgets.values()) if limit is None else limit
+        self.__in_flight = {name: 0 for name in self.__lanes}
+        self.__waiting = {name: 0 for name in self.__lanes}
+        self.__total_in_flight = 0
+        self.__condition = threading.Condition()
+        self.__statistics = dict()
+
+    def __get_lanes(self) -> list:
+        return list(self.__lanes)
+
+    def __get_limit(self) -> int:
+        return self.__limit
+
+    lanes = property(__get_lanes)
+    limit = property(__get_limit)
+
+    def acquire(self, lane: string=None) -> float:
+        """
+        Waits until a request in the given lane may be sent
+
+        :param lane: The name of the lane, None for the highest priority lane
+        :return: The number of seconds spent waiting
+        """
+
+        lane = self.__lanes[0] if lane is None else lane
+
+        if lane not in self.__budgets:
+            raise ValueError("Unknown priority lane : " + lane)
+
+        started = time.time()
+
+        with self.__condition:
+            self.__waiting[lane] += 1
+            self.__record(lane, "max_queue_depth", self.__waiting[lane], max)
+
+            while not self.__can_send(lane):
+                self.__condition.wait()
+
+            self.__waiting[lane] -= 1
+            self.__in_flight[lane] += 1
+            self.__total_in_flight += 1
+
+            waited = time.time() - started
+            self.__record(lane, "requests", 1)
+            self.__record(lane, "wait_time", waited)
+            self.__record(lane, "max_wait_time", waited, max)
+
+        return waited
+
+    def release(self, lane: string=None):
+        """
+        Marks a request acquired in the given lane as finished
+
+        :param lane: The name of the lane, None for the highest priority lane
+        """
+
+        lane = self.__lanes[0] if lane is None else lane
+
+        with self.__condition:
+            self.__in_flight[lane] -= 1
+            self.__total_in_flight -= 1
+            self.__condition.notify_all()
+
+    def retrieve_statistics(self) -> dict:
+        """
+        Retrieves the queue depth, in flight count and wait times of every lane
+
+        :return: A dictionary of counter names and their values
+        """
+
+        with self.__condition:
+            result = dict(self.__statistics)
+
+            for lane in self.__lanes:
+                result["priority." + lane + ".queue_depth"] = self.__waiting[lane]
+                result["priority." + lane + ".in_flight"] = self.__in_flight[lane]
+
+        return result
+
+    def __can_send(self, lane: string=None) -> bool:
+        if self.__in_flight[lane] >= self.__budgets[lane] or self.__total_in_flight >= self.__limit:
+            return False
+
+        # a higher lane that could send right now goes first
+        for higher in self.__lanes[:self.__lanes.index(lane)]:
+            if self.__waiting[higher] > 0 and self.__in_flight[higher] < self.__budgets[higher]:
+                return False
+
+        return True
+
+    def __record(self, lane: string=None, name: string=None, value: float=1, combine=None):
+        name = "priority." + lane + "." + name
+
+        if combine is None:
+            self.__statistics[name] = self.__statistics.get(name, 0) + value
+        else:
+            self.__statistics[name] = combine(self.__statistics.get(name, 0), value)
+
+
+class CouchDBRecorder(object):
+    """
+    Writes every request a manager sends to a gzip compressed NDJSON file so the workload can be replayed later
+    """
+
+    __file = None
+    __lock = None
+    __record_responses = bool
+    __count = int
+
+    def __init__(self, path: string=None, record_responses: bool=True):
+        """
+        Initializes the recorder and opens its file
+
+        :param path: the path of the recording, replaced if it exists
+        :param record_responses: False to only keep the response status and size instead of the whole body, JSON
+        bodies are kept as text and any other body as base64
+        """
+
+        self.__file = gzip.open(path, "wt", encoding="utf-8")
+        self.__lock = threading.Lock()
+        self.__record_responses = record_responses
+        self.__count = 0
+
+    def __get_count(self) -> int:
+        return self.__count
+
+    count = property(__get_count)
+
+    def record(self,
+               method: string=None,
+               path: string=None,
+               params: dict=None,
+               data: object=None,
+               headers: dict=None,
+               started: float=None,
+               elapsed: float=None,
+               response: requests.Response=None,
+               stream: bool=False):
+        """
+        Appends a request and its response to the recording
+
+        :param method: The HTTP method
+        :param path: The path of the request without the scheme, host and port
+        :param params: A dictionary of query string parameters
+        :param data: The request body as sent
+        :param headers: A dictionary of the request headers
+        :param started: The time the request was sent as seconds since the epoch
+        :param elapsed: The number of seconds the request took
+        :param response: The response
+        :param stream: True if the response body is streamed, it is left unread for the caller
+        """
+
+        entry = {"time": started,
+                 "elapsed": elapsed,
+                 "method": method,
+                 "path": path,
+                 "params": {k: str(v) for k, v in (params or dict()).items() if v is not None},
+                 "headers": headers or dict(),
+                 "status": response.status_code}
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        if isinstance(data, bytes):
+            entry["body"] = base64.b64encode(data).decode("ascii")
+            entry["body_size"] = len(data)
+
+        # a streamed body belongs to the caller and can only be read once
+        if stream:
+            entry["response_size"] = None
+        else:
+            entry["response_size"] = len(response.content)
+
+            # attachments and other binary bodies would not survive decoding as text
+            if self.__record_responses and "json" in response.headers.get("Content-Type", ""):
+                entry["response"] = response.text
+            elif self.__record_responses:
+                entry["response_base64"] = base64.b64encode(response.content).decode("ascii")
+
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+
+        with self.__lock:
+            self.__file.write(line)
+            self.__count += 1
+
+    def close(self):
+        """
+        Flushes and closes the recording
+        """
+
+        with self.__lock:
+            self.__file.close()
+
+
+class CouchDBReplayer(object):
+    """
+    Re-issues a workload captured by CouchDBRecorder against a target server and measures how it copes
+    """
+
+    __path = string
+    __target = string
+    __speed = float
+    __concurrency = int
+    __session = None
+
+    def __init__(self,
+                 path: string=None,
+                 target: string="http://127.0.0.1:5984",
+                 speed: float=1.0,
+                 concurrency: int=4,
+                 user: string=None,
+                 password: string=None):
+        """
+        Initializes the replayer
+
+        :param path: the path of a recording written by CouchDBRecorder
+        :param target: the base url of the server to replay against
+        :param speed: 1.0 keeps the original pacing, 2.0 replays twice as fast, None sends as fast as possible
+        :param concurrency: the most requests in flight at the same time
+        :param user: the user to authenticate as on the target
+        :param password: the password for the user
+        """
+
+        self.__path = path
+        self.__target = target.rstrip("/")
+        self.__speed = speed
+        self.__concurrency = concurrency
+        self.__session = requests.Session()
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+
+        if user is not None:
+            self.__session.auth = (user, password)
+
+    def __entries(self):
+        with gzip.open(self.__path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def __issue(self, entry: dict=None) -> tuple:
+        data = None if "body" not in entry else base64.b64decode(entry["body"])
+        started = time.time()
+
+        try:
+            req = self.__session.request(entry["method"], self.__target + entry["path"], params=entry["params"],
+                                         data=data, headers=entry["headers"])
+            status_code = req.status_code
+        except requests.RequestException:
+            status_code = None
+
+        return time.time() - started, status_code, entry["status"]
+
+    def replay(self) -> dict:
+        """
+        Replays the recording and waits for every request to finish
+
+        :return: A dictionary with the request count, duration, throughput, latency percentiles in seconds and the
+        number of failed requests and responses whose status differs from the recording
+        """
+
+        results = list()
+        pending = collections.deque()
+        first = None
+        started = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.__concurrency) as executor:
+            for entry in self.__entries():
+                if first is None:
+                    first = entry["time"]
+
+                if self.__speed is not None:
+                    delay = (entry["time"] - first) / self.__speed - (time.time() - started)
+
+                    if delay > 0:
+                        time.sleep(delay)
+
+                pending.append(executor.submit(self.__issue, entry))
+
+                # keep the backlog bounded so a long recording is not read into memory at max speed
+                while len(pending) > self.__concurrency * 4:
+                    results.append(pending.popleft().result())
+
+            while pending:
+                results.append(pending.popleft().result())
+
+        duration = time.time() - started
+        latencies = sorted(result[0] for result in results)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+
+            return latencies[min(len(latencies) - 1, int(math.ceil(fraction * len(latencies))) - 1)]
+
+        return {"requests": len(results),
+                "duration": duration,
+                "throughput": len(results) / duration if duration > 0 else None,
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+                "failed": sum(1 for result in results if result[1] is None),
+                "mismatched": sum(1 for result in results if result[1] is not None and result[1] != result[2])}
+
+
+# the update handler behind patch_document, applied on the server so a patch never races a concurrent write.
+# set, increment and append create missing objects along their path, remove leaves a missing path alone
+_patch_handler = "function (doc, req) {" \
+                 " if (!doc) { return [null, {code: 404, json: {error: 'not_found'," \
+                 " reason: 'document missing'}}]; }" \
+                 " var operations = JSON.parse(req.body);" \
+                 " for (var i = 0; i < operations.length; i++) {" \
+                 "  var op = operations[i], target = doc, path = op.path;" \
+                 "  for (var j = 0; j < path.length - 1 && target !== undefined; j++) {" \
+                 "   if (typeof target[path[j]] !== 'object' || target[path[j]] === null) {" \
+                 "    if (op.op === 'remove') { target = undefined; break; }" \
+                 "    target[path[j]] = {};" \
+                 "   }" \
+                 "   target = target[path[j]];" \
+                 "  }" \
+                 "  if (target === undefined) { continue; }" \
+                 "  var key = path[path.length - 1];" \
+                 "  if (op.op === 'set') { target[key] = op.value; }" \
+                 "  else if (op.op === 'increment') { target[key] = (target[key] || 0) + op.value; }" \
+                 "  else if (op.op === 'append') {" \
+                 "   if (!Array.isArray(target[key])) { target[key] = []; }" \
+                 "   target[key].push(op.value);" \
+                 "  }" \
+                 "  else if (op.op === 'remove') {" \
+                 "   if (Array.isArray(target)) { target.splice(Number(key), 1); } else { delete target[key]; }" \
+                 "  }" \
+                 "  else { return [null, {code: 400, json: {error: 'bad_request'," \
+                 " reason: 'unknown patch operation ' + op.op}}]; }" \
+                 " }" \
+                 " return [doc, {json: {ok: true, id: doc._id}}];" \
+                 "}"
+
+
+class NativeCouchDBManager(object):
+    # region Instance Fields
+    __name = string
+    __user = string
+    __password = string
+    __host = string
+    __port = int
+    __full_commit = bool
+    __auth_method = string
+    __verify = bool
+    __generate_uuid_from_couch = bool
+    __supported_version = "1.5.0"
+    __patch_design = "couchdb_py_patch_v2"
+    __throw_errors = bool
+    __compression = bool
+    __compression_threshold = int
+    __session = None
+    __statistics = dict
+    __statistics_lock = None
+    __node_pool = None
+    __attachment_cache = None
+    __codecs = None
+    __concurrency_limiter = None
+    __session_timeout = int
+    __auth_cookie = string
+    __auth_expires = float
+    __auth_lock = None
+    __auth_failures = int
+    __auth_retry_at = float
+    __single_flight = None
+    __id_filters = dict
+    __recorder = None
+    __patch_installed = set
+    __scheduler = None
+    __lane = None
+    # endregion
+
+    def __init__(self,
+                 db_name: string="db-test",
+                 db_user: string=None,
+                 db_password: string=None,
+                 db_host_ip: string="127.0.0.1",
+                 db_host_port: int=5984,
+                 db_full_commit: bool=True,
+                 db_auth_method: string="basic",
+                 db_verify: bool=False,
+                 db_generated_uuid_from_couch_db: bool=True,
+                 db_throw_errors: bool=False,
+                 db_compression: bool=False,
+                 db_compression_threshold: int=1024,
+                 db_nodes: list=None,
+                 db_write_policy: string="primary",
+                 db_health_check_interval: float=10.0,
+                 db_attachment_cache: CouchDBAttachmentCache=None,
+                 db_codecs: CouchDBCodecRegistry=None,
+                 db_concurrency_limiter: CouchDBConcurrencyLimiter=None,
+                 db_session_timeout: int=600,
+                 db_single_flight: bool=False,
+                 db_recorder: CouchDBRecorder=None,
+                 db_scheduler: CouchDBPriorityScheduler=None):
+        """
+        Initializes the CouchDB manager
+
+        :param db_name: the name of the database
+        :param db_user: the user to use when accessing the database
+        :param db_password: the password for the user
+        :param db_host_ip: the ip address of the couch db server
+        :param db_host_port: the port of the couch db server
+        :param db_full_commit:
+        :param db_auth_method: the authentication method to use, basic sends the credentials with every request,
+        cookie logs in once through _session and reuses the AuthSession cookie
+        :param db_verify:
+        :param db_generated_uuid_from_couch_db: generate uuids internally or through couchdb
+        :param db_throw_errors: throw errors or suppress them
+        :param db_compression: gzip compress json request bodies larger than the compression threshold
+        :param db_compression_threshold: the size in bytes a json request body must exceed to be compressed
+        :param db_nodes: a list of "host:port" cluster nodes to spread requests over instead of db_host_ip/port
+        :param db_write_policy: how writes are spread over the nodes, primary, round_robin or lowest_latency
+        :param db_health_check_interval: the number of seconds between node health checks, None to disable them,
+        the checks run on a background thread until close() is called
+        :param db_attachment_cache: a cache consulted before downloading and uploading attachments
+        :param db_codecs: the codec registry mapping objects to documents, defaults to default_codec_registry
+        :param db_concurrency_limiter: an adaptive limit on the requests in flight, shared by every thread
+        :param db_session_timeout: the CouchDB session timeout in seconds, cookies are renewed before it passes
+        :param db_single_flight: share one request between threads reading the same document, database info or
+        _all_docs range with the same parameters
+        :param db_recorder: a recorder every request and its response is written to for replaying later
+        :param db_scheduler: priority lanes with separate budgets, requests are put in a lane with priority()
+        """
+        self.__name = db_name
+        self.__user = db_user
+        self.__password = db_password
+        self.__host = db_host_ip
+        self.__port = db_host_port
+        self.__full_commit = db_full_commit
+        self.__auth_method = db_auth_method
+        self.__verify = db_verify
+        self.__generate_uuid_from_couch = db_generated_uuid_from_couch_db
+        self.__throw_errors = db_throw_errors
+        self.__compression = db_compression
+        self.__compression_threshold = db_compression_threshold
+        self.__statistics = dict()
+        self.__statistics_lock = threading.Lock()
+        self.__attachment_cache = db_attachment_cache
+        self.__codecs = default_codec_registry if db_codecs is None else db_codecs
+        self.__concurrency_limiter = db_concurrency_limiter
+        self.__session_timeout = db_session_timeout
+        self.__auth_cookie = None
+        self.__auth_expires = 0.0
+        self.__auth_lock = threading.Lock()
+        self.__auth_failures = 0
+        self.__auth_retry_at = 0.0
+        self.__single_flight = CouchDBSingleFlight() if db_single_flight else None
+        self.__id_filters = dict()
+        self.__recorder = db_recorder
+        self.__patch_installed = set()
+        self.__scheduler = db_scheduler
+        self.__lane = threading.local()
+
+        # a single session pools the connections of every request made through this manager
+        self.__session = requests.Session()
+        self.__session.headers["Accept-Encoding"] = "gzip"
+
+        if db_user is not None and db_auth_method == "basic":
+            self.__session.auth = (db_user, db_password)
+
+        if db_scheduler is not None:
+            # the pool holds a connection for every request the lanes allow in flight
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=db_scheduler.limit)
+            self.__session.mount("http://", adapter)
+            self.__session.mount("https://", adapter)
+
+        if db_nodes is not None:
+            self.__node_pool = CouchDBNodePool(nodes=db_nodes,
+                                               write_policy=db_write_policy,
+                                               health_check_interval=db_health_check_interval)
+            self.__node_pool.start(self)
+
+    def __get_command_text(self, cmd: string=None) -> string:
+        return "http://" + self.__host + ":" + self.__port.__str__() + cmd
+
+    def __send(self,
+               method: string=None,
+               command_text: string=None,
+               params: dict=None,
+               data: object=None,
+               headers: dict=None,
+               stream: bool=False,
+               coalesce: bool=False) -> requests.Response:
+        # identical reads in flight at the same time share one response when the caller marks them as shareable,
+        # uuids and change feeds must reach the server every time. A body can only be streamed once, so a shared
+        # read is downloaded whole and its row readers decode it from memory
+        if self.__single_flight is not None and coalesce:
+            key = (command_text,
+                   tuple(sorted((k, str(v)) for k, v in (params or dict()).items() if v is not None)),
+                   tuple(sorted((headers or dict()).items())))
+
+            return self.__single_flight.do(key, lambda: self.__send_request(method, command_text, params=params,
+                                                                            data=data, headers=headers))
+
+        return self.__send_request(method, command_text, params=params, data=data, headers=headers, stream=stream)
+
+    def __send_request(self,
+                       method: string=None,
+                       command_text: string=None,
+                       params: dict=None,
+                       data: object=None,
+                       headers: dict=None,
+                       stream: bool=False) -> requests.Response:
+        headers = dict() if headers is None else dict(headers)
+
+        if isinstance(data, str) and headers.get("Content-Type") == "application/json":
+            data = data.encode("utf-8")
+
+            if self.__compression and len(data) > self.__compression_threshold:
+                compressed = gzip.compress(data)
+
+                self.__record_statistic("compression.request_bytes", len(data))
+                self.__record_statistic("compression.request_bytes_sent", len(compressed))
+
+                data = compressed
+                headers["Content-Encoding"] = "gzip"
+
+        cookie_auth = self.__auth_method == "cookie" and self.__user is not None
+
+        if cookie_auth and (self.__auth_cookie is None or time.time() >= self.__auth_expires):
+            with self.__auth_lock:
+                # another thread may have logged in while this one waited for the lock, and after a failed login
+                # requests go out without a session until the backoff passes instead of all logging in again
+                if (self.__auth_cookie is None or time.time() >= self.__auth_expires) \
+                        and time.time() >= self.__auth_retry_at:
+                    self.__create_session()
+
+        # a longpoll waits for changes on purpose, its latency says nothing about load and it holds no slot or lane,
+        # a replica polling for its whole timeout would otherwise keep interactive requests waiting
+        waiting_feed = params is not None and params.get("feed") in ("longpoll", "continuous")
+        limiter = None if waiting_feed else self.__concurrency_limiter
+        scheduler = None if waiting_feed else self.__scheduler
+        lane = getattr(self.__lane, "name", None)
+
+        for attempt in range(2):
+            status_code = None
+
+            if scheduler is not None:
+                scheduler.acquire(lane)
+
+            if limiter is not None:
+                limiter.acquire()
+
+            started = time.time()
+
+            def release(latency, status_code, limiter=limiter, lane=lane):
+                if limiter is not None:
+                    limiter.release(latency, status_code, self.__request_class(method, command_text))
+
+                if scheduler is not None:
+                    scheduler.release(lane)
+
+            try:
+                req = self.__dispatch(method, command_text, params=params, data=data, headers=headers,
+                                      stream=stream)
+                status_code = req.status_code
+            except BaseException:
+                release(time.time() - started, status_code)
+                raise
+
+            if stream and 200 <= status_code < 300:
+                # the server is still sending a streamed body, so its slot and lane are held until the caller closes
+                # the response, as CouchDBRowReader does after the last row. The limiter still sees the latency up
+                # to the headers, the time spent reading rows depends on the caller
+                self.__release_on_close(req, lambda latency=time.time() - started, status_code=status_code:
+                                        release(latency, status_code))
+            else:
+                release(time.time() - started, status_code)
+
+            self.__record_statistic("requests", 1)
+
+            if status_code != 401 or not cookie_auth or attempt > 0:
+                break
+
+            # the session was revoked or outlived its timeout on the server, log in again and repeat once
+            self.__record_statistic("auth.reauthentications", 1)
+
+            with self.__auth_lock:
+                if time.time() < self.__auth_retry_at or not self.__create_session():
+                    break
+
+        if cookie_auth and req.cookies.get("AuthSession") is not None:
+            # CouchDB hands out a renewed cookie once a session is partly used up
+            with self.__auth_lock:
+                self.__auth_cookie = req.cookies.get("AuthSession")
+                self.__auth_expires = time.time() + self.__session_timeout * 0.9
+
+        if not stream and req.headers.get("Content-Encoding") == "gzip" and "Content-Length" in req.headers:
+            self.__record_statistic("compression.response_bytes", len(req.content))
+            self.__record_statistic("compression.response_bytes_received", int(req.headers["Content-Length"]))
+
+        if self.__recorder is not None:
+            self.__recorder.record(method, command_text[len(self.__get_command_text("")):], params=params,
+                                   data=data, headers=headers, started=started, elapsed=time.time() - started,
+                                   response=req, stream=stream)
+
+        return req
+
+    def __release_on_close(self, req: requests.Response=None, release=None):
+        # the size of a streamed body is only known once it is read, so its compression is counted on close as well
+        gzipped = req.headers.get("Content-Encoding") == "gzip"
+        iter_content = req.iter_content
+        close = req.close
+        decoded = [0]
+
+        def counting_iter_content(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                decoded[0] += len(chunk)
+                yield chunk
+
+        def closing():
+            # the slot is only given back and the bytes only counted on the first close
+            req.close = close
+
+            try:
+                if gzipped:
+                    self.__record_statistic("compression.response_bytes", decoded[0])
+                    self.__record_statistic("compression.response_bytes_received", req.raw.tell())
+
+                close()
+            finally:
+                release()
+
+        if gzipped:
+            req.iter_content = counting_iter_content
+
+        req.close = closing
+
+    def __request_class(self, method: string=None, command_text: string=None) -> string:
+        # requests are grouped by method and endpoint, such as "GET _all_docs" or "PUT document"
+        parts = [part for part in command_text[len(self.__get_command_text("")):].split("/") if part]
+        endpoints = [part for part in parts if part.startswith("_") and part != "_design"]
+
+        if endpoints:
+            return method + " " + endpoints[-1]
+
+        return method + " " + ("server", "database", "document", "attachment")[min(len(parts), 3)]
+
+    def __dispatch(self,
+                   method: string=None,
+                   command_text: string=None,
+                   params: dict=None,
+                   data: object=None,
+                   headers: dict=None,
+                   stream: bool=False) -> requests.Response:
+        cookies = None if self.__auth_cookie is None else {"AuthSession": self.__auth_cookie}
+
+        if self.__node_pool is None:
+            return self.__session.request(method, command_text, params=params, data=data, headers=headers,
+                                          cookies=cookies, stream=stream)
+
+        # only reads are retried on another node, a write may have been applied before the connection dropped
+        path = command_text[len(self.__get_command_text("")):]
+        attempts = len(self.__node_pool.nodes) if method in ("GET", "HEAD") else 1
+        failed = list()
+
+        while True:
+            node = self.__node_pool.select(method, exclude=failed)
+            started = time.time()
+
+            try:
+                req = self.__session.request(method, node.base_url + path, params=params, data=data,
+                                             headers=headers, cookies=cookies, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                self.__node_pool.report(node, time.time() - started, succeeded=False)
+                self.__record_statistic("cluster.failed_requests", 1)
+                failed.append(node)
+
+                if len(failed) >= attempts or self.__node_pool.pinned:
+                    raise
+                continue
+
+            self.__node_pool.report(node, time.time() - started, succeeded=req.status_code < 500)
+
+            return req
+
+    def create_session(self) -> bool:
+        """
+        Logs in through _session, after which requests carry the AuthSession cookie instead of credentials.
+        Requests made with the cookie auth method log in by themselves, so this is only needed to log in early.
+
+        :return: True if logged in, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # POST /_session HTTP/1.1
+        # Content-Type: application/x-www-form-urlencoded
+        #
+        # name=root&password=relax
+
+        # HTTP/1.1 200 OK
+        # Set-Cookie: AuthSession=cm9vdDo1MEJCRkYwMjq0LO0ylOIwShrgt8y-UkhI-c6BGw; Version=1; Path=/; HttpOnly
+        #
+        # {"ok": true, "name": "root", "roles": ["_admin"]}
+        #endregion
+
+        with self.__auth_lock:
+            return self.__create_session()
+
+    def delete_session(self) -> bool:
+        """
+        Logs out of the current _session
+
+        :return: True if logged out, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # DELETE /_session HTTP/1.1
+        # Cookie: AuthSession=cm9vdDo1MEJDMzQxOTrbYyo_UMhT6zyQQKQSGkqWlYVJrw
+
+        # HTTP/1.1 200 OK
+        # Set-Cookie: AuthSession=; Version=1; Path=/; HttpOnly
+        #
+        # {"ok": true}
+        #endregion
+
+        req = self.__dispatch("DELETE", self.__get_command_text("/_session"))
+
+        with self.__auth_lock:
+            self.__auth_cookie = None
+            self.__auth_expires = 0.0
+
+        return req.status_code == 200
+
+    def __create_session(self) -> bool:
+        # called with the auth lock held, straight through __dispatch so the login is not itself authenticated
+        self.__auth_cookie = None
+        req = self.__dispatch("POST",
+                              self.__get_command_text("/_session"),
+                              data={"name": self.__user, "password": self.__password},
+                              headers={"Content-Type": "application/x-www-form-urlencoded"})
+        self.__record_statistic("auth.logins", 1)
+
+        if req.status_code == 200 and req.cookies.get("AuthSession") is not None:
+            self.__auth_cookie = req.cookies.get("AuthSession")
+            self.__auth_expires = time.time() + self.__session_timeout * 0.9
+            self.__auth_failures = 0
+            self.__auth_retry_at = 0.0
+            return True
+
+        # wrong credentials stay wrong, wait 1 second after the first failure and up to a minute after later ones
+        self.__auth_failures += 1
+        self.__auth_retry_at = time.time() + min(60.0, 2.0 ** (self.__auth_failures - 1))
+        self.__record_statistic("auth.failures", 1)
+
+        if self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            cdb_error = CouchDBError()
+            cdb_error.title = "401 Unauthorized – Username or password wasn’t recognized"
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+            raise cdb_error
+
+        return False
+
+    def retrieve_nodes(self) -> list:
+        """
+        Retrieves the cluster nodes this manager spreads its requests over
+
+        :return: A list of CouchDBNode objects, empty if the manager talks to a single server
+        """
+
+        return list() if self.__node_pool is None else self.__node_pool.nodes
+
+    def close(self):
+        """
+        Stops the node health checks and releases the pooled connections, a manager built with db_nodes keeps a
+        background thread running until it is closed
+        """
+
+        if self.__node_pool is not None:
+            self.__node_pool.stop()
+
+        self.__session.close()
+
+    @contextlib.contextmanager
+    def priority(self, lane: string=None):
+        """
+        Sends the requests made by the current thread inside the with block through a priority lane, work this
+        manager hands to its own worker threads keeps the lane
+
+        :param lane: The name of a lane of the scheduler, such as interactive or batch
+        :return: A context manager
+        """
+
+        previous = getattr(self.__lane, "name", None)
+        self.__lane.name = lane
+
+        try:
+            yield
+        finally:
+            self.__lane.name = previous
+
+    def __submit(self, executor: ThreadPoolExecutor=None, fn=None, *args):
+        # work handed to another thread keeps the priority lane of the thread handing it over
+        lane = getattr(self.__lane, "name", None)
+
+        def run():
+            previous = getattr(self.__lane, "name", None)
+            self.__lane.name = lane
+
+            try:
+                return fn(*args)
+            finally:
+                self.__lane.name = previous
+
+        return executor.submit(run)
+
+    def __record_statistic(self, name: string=None, value: float=1):
+        with self.__statistics_lock:
+            self.__statistics[name] = self.__statistics.get(name, 0) + value
+
+    def retrieve_statistics(self) -> dict:
+        """
+        Retrieves the counters collected by this manager
+
+        :return: A dictionary of counter names and their values
+        """
+
+        with self.__statistics_lock:
+            result = dict(self.__statistics)
+
+        if self.__concurrency_limiter is not None:
+            result.update(self.__concurrency_limiter.retrieve_statistics())
+
+        if self.__single_flight is not None:
+            result.update(self.__single_flight.retrieve_statistics())
+
+        if self.__scheduler is not None:
+            result.update(self.__scheduler.retrieve_statistics())
+
+        result["compression.bytes_saved"] = \
+            result.get("compression.request_bytes", 0) - result.get("compression.request_bytes_sent", 0) + \
+            result.get("compression.response_bytes", 0) - result.get("compression.response_bytes_received", 0)
+
+        return result
+
+    # region Not Implemented
+
+    # def retrieve_current_document_revision(self, database_name, doc_id):
+    #     # HEAD /somedatabase/some_doc_id HTTP/1.0
+    #
+    #     # HTTP/1.1 200 OK
+    #     # Etag: "946B7D1C"
+    #     # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+    #     # Content-Type: application/json
+    #     # Content-Length: 256
+    #     pass
+
+    # def retrieve_document_revision(self, database_name: string=None, doc_id: string=None):
+    #     pass
+
+    #endregion
+
+    def retrieve_uuid(self, count: int=None) -> string:
+        """
+        Retrieves / Generates a UUID from CouchDB. If one cannot be generating
+
+        :param count: An integer representing the number of UUIDs to retrieve
+        :return: A string of a UUID if count is None, A list of UUIDs if count is not None, None otherwise
+        """
+
+        #region Sample Req/Resp
+        #curl -X GET http://127.0.0.1:5984/_uuids
+
+        #{"uuids":["6e1295ed6c29495e54cc05947f18c8af"]}
+        #endregion
+
+        result = None
+
+        if not self.__generate_uuid_from_couch:
+            result = uuid.uuid1().__str__()
+        else:
+            command_text = self.__get_command_text("/_uuids")
+            payload = {"count": count}
+            req = self.__send("GET", command_text, params=payload)
+            status_code = req.status_code
+
+            if status_code == 200:
+
+                json_result = req.json()
+
+                if count is None:
+                    result = json_result["uuids"][0]
+                else:
+                    result = json_result["uuids"]
+
+            else:
+                if self.__throw_errors is True:
+                    cdb_error = CouchDBError()
+                    cdb_error.title = "Failed to retrieve a uuid from CouchDB"
+                    raise cdb_error
+                else:
+                    result = uuid.uuid1().__str__()
+
+        return result
+
+    def retrieve_status(self) -> string:
+        """
+        Retrieves the current status of Couch DB.
+
+        :return: None if not available otherwise the version of Couch DB as a string
+        """
+
+        #region Sample Req/Resp
+        # http://127.0.0.1:5984/
+
+        # {
+        #   "couchdb": "Welcome",
+        #   "uuid": "85fb71bf700c17267fef77535820e371",
+        #   "vendor": {
+        #       "name": "The Apache Software Foundation",
+        #       "version": "1.5.0"
+        #   },
+        #   "version": "1.5.0"
+        # }
+        #endregion
+
+        connect_string = self.__get_command_text("")
+        req = self.__send("GET", connect_string)
+        status_code = req.status_code
+        reason = req.reason
+
+        if status_code == 200 and reason == "OK":
+            json_result = req.json()
+            version = json_result['version']
+        else:
+            if self.__throw_errors is True:
+                cdb_error = CouchDBError()
+                cdb_error.title = "Unable to get the CouchDB server status"
+                raise cdb_error
+            else:
+                version = None
+
+        return version
+
+    def create_database(self, database_name: string=None) -> bool:
+        """
+        Creates a database in CoucbDB
+
+        :param database_name: The name to give to the new CouchDB database
+        :return: True if created, False if already exists, None if unknown
+        """
+
+        #region Sample Req/Resp
+        #PUT http://127.0.0.1:5984/database_name
+
+        #{"ok":true}
+        #{"error":"file_exists","reason":"The database could not be created, the file already exists."}
+        #endregion
+
+        result = None
+        command_text = self.__get_command_text("/" + database_name)
+        req = self.__send("PUT", command_text)
+        status_code = req.status_code
+
+        if status_code == 201 or status_code == 200:
+            #201 Created – Database created successfully
+            result = True
+        else:
+            json_result = req.json()
+            result = False
+            error = json_result["error"]
+            reason = json_result["reason"]
+
+            if self.__throw_errors is True:
+
+                cdb_error = CouchDBError()
+                cdb_error.description = "[" + error + "] " + reason
+
+                if status_code == 400:
+                    cdb_error.title = "400 Bad Request – Invalid database name"
+                elif status_code == 401:
+                    cdb_error.title = "401 Unauthorized – CouchDB Server Administrator privileges required"
+                elif status_code == 412:
+                    cdb_error.title = "412 Precondition Failed – Database already exists"
+                else:
+                    cdb_error.title = "An unknown status code was encountered : " + status_code
+
+                raise cdb_error
+
+        return result
+
+    def delete_database(self, database_name: string=None) -> bool:
+        """
+        Deletes a database in CouchDB
+
+        :param database_name: A string representation of the database name to be deleted
+        :return: True if deleted, False if not, otherwise None for unknown
+        """
+
+        #region Sample Req/Resp
+        #DELETE http://127.0.0.1:5984/database_name
+
+        #{"ok":true}
+        #endregion
+
+        result = None
+        command_text = self.__get_command_text("/" + database_name)
+        req = self.__send("DELETE", command_text)
+        status_code = req.status_code
+
+        if status_code == 200:
+            #200 OK – Database removed successfully
+            result = True
+        else:
+            json_result = req.json()
+            result = False
+            error = json_result["error"]
+            reason = json_result["reason"]
+
+            if self.__throw_errors is True:
+
+                cdb_error = CouchDBError()
+                cdb_error.description = "[" + error + "] " + reason
+
+                if status_code == 400:
+                    cdb_error.title = "400 Bad Request – Invalid database name"
+                elif status_code == 401:
+                    cdb_error.title = "401 Unauthorized – CouchDB Server Administrator privileges required"
+                elif status_code == 404:
+                    cdb_error.title = "404 Not Found – Database doesn’t exist"
+                else:
+                    cdb_error.title = "An unknown status code was encountered : " + status_code
+
+                raise cdb_error
+
+        return result
+
+    def retrieve_all_databases(self) -> list:
+        """
+        Retrieve all databases found in CouchDB
+
+        :return: A list of strings representing the name for each database, None otherwise
+        """
+
+        #region Sample Req/Resp
+        #GET /_all_dbs
+
+        # HTTP/1.1 200 OK
+        # Cache-Control: must-revalidate
+        # Content-Length: 52
+        # Content-Type: application/json
+        # Date: Sat, 10 Aug 2013 06:57:48 GMT
+        # Server: CouchDB (Erlang/OTP)
+        #
+        # [
+        #    "_users",
+        #    "contacts",
+        #    "docs",
+        #    "invoices",
+        #    "locations"
+        # ]
+        #endregion
+
+        command_text = self.__get_command_text("/_all_dbs")
+        req = self.__send("GET", command_text)
+        status_code = req.status_code
+        result = None
+
+        if status_code == 200:
+            result = req.json()
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            error = json_result["error"]
+            reason = json_result["reason"]
+            cdb_error = CouchDBError()
+            cdb_error.title = "Unknown status code encountered : " + status_code
+            cdb_error.description = "[" + error + "]" + reason
+            raise cdb_error
+
+        return result
+
+    def retrieve_database(self, database_name: string=None) -> CouchDB:
+        """
+        Retrieves the basic information related to a CoucbDB database
+
+        :param database_name: a string representation of the database name in CouchDB to retrieve
+        :return: A CoucbDB object if found, None otherwise
+        """
+
+        #region Sample Req/Resp
+        # GET /receipts HTTP/1.1
+        # Accept: application/json
+        # Host: localhost:5984
+
+        # HTTP/1.1 200 OK
+        # Cache-Control: must-revalidate
+        # Content-Length: 258
+        # Content-Type: application/json
+        # Date: Mon, 12 Aug 2013 01:38:57 GMT
+        # Server: CouchDB (Erlang/OTP)
+        #
+        # {
+        #     "committed_update_seq": 292786,
+        #     "compact_running": false,
+        #     "data_size": 65031503,
+        #     "db_name": "receipts",
+        #     "disk_format_version": 6,
+        #     "disk_size": 137433211,
+        #     "doc_count": 6146,
+        #     "doc_del_count": 64637,
+        #     "instance_start_time": "1376269325408900",
+        #     "purge_seq": 0,
+        #     "update_seq": 292786
+        # }
+        #endregion
+
+        command_text = self.__get_command_text("/" + database_name)
+        req = self.__send("GET", command_text, coalesce=True)
+        status_code = req.status_code
+        result = None
+        json_result = None
+
+        if status_code == 200:
+            json_result = req.json()
+            result = CouchDB()
+            result.committed_update_seq = json_result["committed_update_seq"]
+            result.compact_running = json_result["compact_running"]
+            result.data_size = json_result["data_size"]
+            result.db_name = json_result["db_name"]
+            result.disk_format_version = json_result["disk_format_version"]
+            result.disk_size = json_result["disk_size"]
+            result.doc_count = json_result["doc_count"]
+            result.doc_del_count = json_result["doc_del_count"]
+            result.instance_start_time = json_result["instance_start_time"]
+            result.purge_seq = json_result["purge_seq"]
+            result.update_seq = json_result["update_seq"]
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            error = json_result["error"]
+            reason = json_result["reason"]
+            cdb_error = CouchDBError()
+            cdb_error.title = "404 Not Found – Requested database not found"
+            cdb_error.description = "[" + error + "]" + reason
+            raise cdb_error
+
+        return result
+
+    def retrieve_databases(self, databases: object=None, workers: int=8) -> dict:
+        """
+        Retrieves the information of many databases at the same time
+
+        :param databases: A list of database names, or a wildcard pattern such as "tenant-*" matched against every
+        database on the server
+        :param workers: An integer setting the number of databases queried at the same time
+        :return: A dictionary of database name to populated CouchDB object, databases that failed are left out
+        """
+
+        result = dict()
+
+        for database_name, database in self.iterate_databases(databases,
+                                                              lambda name: [self.retrieve_database(name)],
+                                                              workers=workers):
+            if database is not None:
+                result[database_name] = database
+
+        return result
+
+    def iterate_databases(self,
+                          databases: object=None,
+                          operation=None,
+                          workers: int=8,
+                          key=None,
+                          chunk_size: int=1000):
+        """
+        Runs the same operation against many databases at the same time and streams the results tagged with the
+        database they came from. Each database is read a chunk at a time, so memory stays bounded however many rows
+        an operation yields.
+
+        :param databases: A list of database names, or a wildcard pattern such as "tenant-*" matched against every
+        database on the server
+        :param operation: A callable receiving a database name and returning an iterable of results, for example
+        lambda name: manager.iterate_all_documents(name). The iterable is paused between chunks, so it must not keep
+        a response open between results, its request slot would stay taken while other databases wait for one
+        :param workers: An integer setting the number of databases queried at the same time
+        :param key: A callable receiving a result and returning its sort key, to merge results that each operation
+        yields in that order into one sorted stream, None to yield results as soon as they arrive
+        :param chunk_size: An integer setting the number of results read from a database at a time
+        :return: A generator of (database name, result) tuples
+        """
+
+        if isinstance(databases, str):
+            databases = [database_name for database_name in self.retrieve_all_databases() or list()
+                         if fnmatch.fnmatchcase(database_name, databases)]
+
+        # a chunk is taken from iterators that close each page before yielding it, like iterate_all_documents, so
+        # no slot of the limiter or the scheduler stays held while the iterator waits for its next submission
+        def read(database_name, iterator):
+            if iterator is None:
+                iterator = iter(operation(database_name) or list())
+
+            return database_name, iterator, list(itertools.islice(iterator, chunk_size))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if key is None:
+                pending = {self.__submit(executor, read, database_name, None) for database_name in databases}
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        database_name, iterator, results = future.result()
+
+                        # the next chunk is fetched while this one is consumed
+                        if len(results) == chunk_size:
+                            pending.add(self.__submit(executor, read, database_name, iterator))
+
+                        for result in results:
+                            yield database_name, result
+            else:
+                def stream(index, future):
+                    counter = itertools.count()
+
+                    while future is not None:
+                        database_name, iterator, results = future.result()
+                        future = None if len(results) < chunk_size else \
+                            self.__submit(executor, read, database_name, iterator)
+
+                        # the index and counter break ties so results themselves are never compared
+                        for result in results:
+                            yield key(result), index, next(counter), database_name, result
+
+                # heapq.merge waits on each stream's first chunk in turn, so every first read is submitted up front
+                futures = [self.__submit(executor, read, database_name, None) for database_name in databases]
+                streams = [stream(index, future) for index, future in enumerate(futures)]
+
+                for _, _, _, database_name, result in heapq.merge(*streams):
+                    yield database_name, result
+
+    def compact_database(self, database_name: string=None) -> bool:
+        """
+        Starts compaction of a CouchDB database, which rewrites the database file without old revisions
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: True if compaction was started, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # POST /receipts/_compact HTTP/1.1
+        # Content-Type: application/json
+
+        # HTTP/1.1 202 Accepted
+        #
+        # {"ok": true}
+        #endregion
+
+        command_text = self.__get_command_text("/" + database_name + "/_compact")
+        return self.__send_maintenance(command_text, "Unable to start the database compaction")
+
+    def compact_view(self, database_name: string=None, design_document: string=None) -> bool:
+        """
+        Starts compaction of the view indexes of a design document
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param design_document: A string representation of the design document name, without the _design/ prefix
+        :return: True if compaction was started, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # POST /receipts/_compact/reports HTTP/1.1
+        # Content-Type: application/json
+
+        # HTTP/1.1 202 Accepted
+        #
+        # {"ok": true}
+        #endregion
+
+        command_text = self.__get_command_text("/" + database_name + "/_compact/" + design_document)
+        return self.__send_maintenance(command_text, "Unable to start the view compaction")
+
+    def cleanup_views(self, database_name: string=None) -> bool:
+        """
+        Removes view index files that are no longer required by any design document
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: True if the cleanup was started, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # POST /receipts/_view_cleanup HTTP/1.1
+        # Content-Type: application/json
+
+        # HTTP/1.1 202 Accepted
+        #
+        # {"ok": true}
+        #endregion
+
+        command_text = self.__get_command_text("/" + database_name + "/_view_cleanup")
+        return self.__send_maintenance(command_text, "Unable to start the view cleanup")
+
+    def retrieve_design_documents(self, database_name: string=None) -> list:
+        """
+        Retrieves the names of the design documents in a database
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: A list of design document names without the _design/ prefix
+        """
+
+        return [row["id"][len("_design/"):] for row in self.iterate_all_documents(database_name=database_name,
+                                                                                  start_key="_design/",
+                                                                                  end_key="_design0",
+                                                                                  inclusive_end=False)]
+
+    def retrieve_revision_limit(self, database_name: string=None) -> int:
+        """
+        Retrieves how many revisions of each document a database remembers
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: The revision limit, None otherwise
+        """
+
+        #region Sample Req/Resp
+        # GET /receipts/_revs_limit HTTP/1.1
+
+        # HTTP/1.1 200 OK
+        #
+        # 1000
+        #endregion
+
+        result = None
+        command_text = self.__get_command_text("/" + database_name + "/_revs_limit")
+        req = self.__send("GET", command_text)
+        status_code = req.status_code
+
+        if status_code == 200:
+            result = int(req.text)
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            cdb_error = CouchDBError()
+            cdb_error.title = "Unable to retrieve the revision limit"
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+            raise cdb_error
+
+        return result
+
+    def update_revision_limit(self, database_name: string=None, limit: int=1000) -> bool:
+        """
+        Sets how many revisions of each document a database remembers, older revisions are dropped at compaction
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param limit: An integer setting the number of revisions to remember
+        :return: True if the limit was set, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # PUT /receipts/_revs_limit HTTP/1.1
+        # Content-Type: application/json
+        #
+        # 100
+
+        # HTTP/1.1 200 OK
+        #
+        # {"ok": true}
+        #endregion
+
+        command_text = self.__get_command_text("/" + database_name + "/_revs_limit")
+        req = self.__send("PUT", command_text, data=json.dumps(limit), headers={"Content-Type": "application/json"})
+        status_code = req.status_code
+        result = False
+
+        if status_code == 200:
+            result = True
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            cdb_error = CouchDBError()
+            cdb_error.title = "Unable to update the revision limit"
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+            raise cdb_error
+
+        return result
+
+    def __send_maintenance(self, command_text: string=None, title: string=None) -> bool:
+        req = self.__send("POST", command_text, headers={"Content-Type": "application/json"})
+        status_code = req.status_code
+        result = False
+
+        if status_code == 202 or status_code == 200:
+            result = True
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            cdb_error = CouchDBError()
+            cdb_error.title = title
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+            raise cdb_error
+
+        return result
+
+    def create_document(self, database_name: string=None, did: string=None, value: object=None) -> CouchDBDocument:
+        """
+        Creates a document for the given CouchDB database provided
+
+        :param did: The document id if you wish to manually assign the ID to the document
+        :param value: The object to store as a document in CoucbDB
+        :param database_name: A string representation of the database name in CouchDB
+        :return: The value provided as a parameter appended with doc_id and rev_id if either are None then create failed
+        """
+
+        #region Sample Req/Resp
+        #PUT /somedatabase/some_doc_id HTTP/1.0
+        # Content-Length: 245
+        # Content-Type: application/json
+        #
+        # {
+        #   "Subject":"I like Plankton",
+        #   "Author":"Rusty",
+        #   "PostedDate":"2006-08-15T17:30:12-04:00",
+        #   "Tags":["plankton", "baseball", "decisions"],
+        #   "Body":"I decided today that I don't like baseball. I like plankton."
+        # }
+
+        # HTTP/1.1 201 Created
+        # Etag: "946B7D1C"
+        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+        # Content-Type: application/json
+        # Connection: close
+        #
+        # {"ok": true, "id": "some_doc_id", "rev": "946B7D1C"}
+
+        # HTTP/1.1 409 Conflict
+        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+        # Content-Length: 33
+        # Connection: close
+        #
+        # {"error":"conflict","reason":"Document update conflict."}
+        #endregion
+
+        if did is None:
+            cdb_uid = self.retrieve_uuid()
+        else:
+            cdb_uid = did
+
+        result = None
+        command_text = self.__get_command_text("/" + database_name + "/" + cdb_uid)
+        jsn = self.__codecs.dumps(value, sort_keys=True, indent="\t")
+        req = self.__send("PUT", command_text, data=jsn, headers={"Content-Type": "application/json"})
+        status_code = req.status_code
+        json_result = None
+
+        if status_code == 201 or status_code == 409:
+            # a conflict still proves the document exists
+            self.__remember_document_ids(database_name, [cdb_uid])
+
+        if status_code == 201:
+
+            # 201 Created – Document created and stored on disk
+            json_result = req.json()
+            result = CouchDBDocument()
+            result.json = json_result
+            result.id = json_result["id"]
+            result.rev = json_result["rev"]
+
+        elif self.__throw_errors is True:
+
+            json_result = json.loads(req.text)
+            error = json_result["error"]
+            reason = json_result["reason"]
+
+            cdb_error = CouchDBError()
+            cdb_error.description = "[" + error + "]" + reason
+
+            if status_code == 202:
+                cdb_error.title = "202 Accepted – Document data accepted, but not yet stored on disk"
+            elif status_code == 400:
+                cdb_error.title = "400 Bad Request – Invalid request body or parameters"
+            elif status_code == 401:
+                cdb_error.title = "401 Unauthorized – Write privileges required"
+            elif status_code == 404:
+                cdb_error.title = "404 Not Found – Specified database or document ID doesn’t exists"
+            elif status_code == 409:
+                cdb_error.title = "409 Conflict – Document with the specified ID already exists or specified revision" \
+                                  " is not latest for target document"
+
+            raise cdb_error
+
+        return result
+
+    def retrieve_document(self,
+                          database_name: string=None,
+                          doc_id: string=None,
+                          rev_id: string=None,
+                          attachments: bool=False,
+                          revisions: bool=False,
+                          rev_info: bool=False) -> CouchDBDocument:
+        """
+        Retrieves a CouchDB document
+
+        :param database_name: A string representation of the name of the CouchDB database name
+        :param doc_id: A string representation of the document ID to be retrieved
+        :param rev_id: A string representation of hte revision ID to be retrieved for a given document ID
+        :param attachments: A boolean representation whether or not to retrieve the attachments for the CouchDBDocument
+        :return: Returns a populated CouchDBDocument if found, None otherwise
+        """
+
+        #region Sample Req/Resp
+        #GET /somedatabase/some_doc_id HTTP/1.0
+        #GET /somedatabase/some_doc_id?attachments=true HTTP/1.0
+        #GET /somedatabase/some_doc_id?rev=946B7D1C HTTP/1.0
+
+        # HTTP/1.1 200 OK
+        # Etag: "946B7D1C"
+        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+        # Content-Type: application/json
+        # Content-Length: 256
+        # Connection: close
+        #
+        # {
+        #  "_id":"some_doc_id",
+        #  "_rev":"946B7D1C",
+        #  "Subject":"I like Plankton",
+        #  "Author":"Rusty",
+        #  "PostedDate":"2006-08-15T17:30:12Z-04:00",
+        #  "Tags":["plankton", "baseball", "decisions"],
+        #  "Body":"I decided today that I don't like baseball. I like plankton."
+        # }
+        #endregion
+
+        result = None
+        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
+        payload = {"rev": rev_id}
+        headers = None
+
+        if attachments:
+            # asking for multipart lets the attachments arrive as binary parts instead of base64 inside the json
+            payload["attachments"] = "true"
+            headers = {"Accept": "multipart/related, application/json"}
+
+        # attachments are streamed part by part, so only a read without them is shared
+        req = self.__send("GET", command_text, params=payload, headers=headers, stream=attachments,
+                          coalesce=not attachments)
+        status_code = req.status_code
+
+        if status_code == 200:
+
+            parts = None
+            read_attachments = None
+
+            try:
+                if req.headers.get("Content-Type", "").startswith("multipart/related"):
+                    parts = self.__read_multipart(req)
+                    json_result = json.loads(next(parts)[1].decode("utf-8"),
+                                             object_pairs_hook=collections.OrderedDict)
+                else:
+                    json_result = req.json()
+
+                if attachments:
+                    read_attachments = self.__read_attachments(json_result, parts)
+            finally:
+                # a streamed response holds its request slot until it is closed
+                req.close()
+
+            cb_doc = CouchDBDocument()
+            cb_doc.id = json_result["_id"]
+            cb_doc.rev = json_result["_rev"]
+            cb_doc.json = json_result
+            cb_doc.value = self.__codecs.decode(json_result)
+
+            if attachments:
+                cb_doc.attachments = read_attachments
+
+            if revisions:
+                # cb_doc.revisions
+                #TODO: add revisions
+                pass
+
+            if rev_info:
+                cb_doc.revs_info = self.retrieve_document_revision_info(database_name=database_name, doc_id=doc_id)
+
+            # cb_doc.conflicts
+            # cb_doc.deleted
+            # cb_doc.deleted_conflicts
+            # cb_doc.local_seq
+
+            result = cb_doc
+
+        elif self.__throw_errors is True:
+
+            json_result = json.loads(req.text)
+            error = json_result["error"]
+            reason = json_result["reason"]
+
+            cdb_error = CouchDBError()
+            cdb_error.description = "[" + error + "]" + reason
+
+            if status_code == 304:
+                cdb_error.title = "304 Not Modified – Document wasn’t modified since specified revision"
+            elif status_code == 400:
+                cdb_error.title = "400 Bad Request – The format of the request or revision was invalid"
+            elif status_code == 401:
+                cdb_error.title = "401 Unauthorized – Read privilege required"
+            elif status_code == 404:
+                cdb_error.title = "404 Not Found – Document not found"
+
+            raise cdb_error
+
+        return result
+
+    def create_document_with_attachments(self,
+                                         database_name: string=None,
+                                         did: string=None,
+                                         value: object=None,
+                                         attachments: list=None) -> CouchDBDocument:
+        """
+        Creates a document together with its attachments in a single multipart/related request, so the document
+        gets one revision and the attachments are sent as binary rather than base64
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param did: The document id if you wish to manually assign the ID to the document
+        :param value: The object to store as a document in CouchDB
+        :param attachments: A list of CouchDBAttachment objects to store with the document
+        :return: A CouchDBDocument with the doc id and rev id if created, None otherwise
+        """
+
+        #region Sample Req/Resp
+        # PUT /somedatabase/some_doc_id HTTP/1.0
+        # Content-Type: multipart/related; boundary="abc123"
+        #
+        # --abc123
+        # Content-Type: application/json
+        #
+        # {"Subject": "I like Plankton",
+        #  "_attachments": {"plankton.jpg": {"follows": true, "content_type": "image/jpeg", "length": 245}}}
+        # --abc123
+        # Content-Type: image/jpeg
+        # Content-Disposition: attachment; filename="plankton.jpg"
+        #
+        # <JPEG data>
+        # --abc123--
+
+        # HTTP/1.1 201 Created
+        #
+        # {"ok": true, "id": "some_doc_id", "rev": "1-946B7D1C"}
+        #endregion
+
+        if did is None:
+            cdb_uid = self.retrieve_uuid()
+        else:
+            cdb_uid = did
+
+        document = json.loads(self.__codecs.dumps(value), object_pairs_hook=collections.OrderedDict)
+        req = self.__send_multipart(database_name, cdb_uid, document, attachments)
+        status_code = req.status_code
+        result = None
+
+        if status_code == 201 or status_code == 202 or status_code == 409:
+            self.__remember_document_ids(database_name, [cdb_uid])
+
+        if status_code == 201 or status_code == 202:
+
+            json_result = req.json()
+            result = CouchDBDocument()
+            result.json = json_result
+            result.id = json_result["id"]
+            result.rev = json_result["rev"]
+
+        elif self.__throw_errors is True:
+
+            self.__raise_multipart_error(req)
+
+        return result
+
+    def update_document_with_attachments(self,
+                                         database_name: string=None,
+                                         value: CouchDBDocument=None,
+                                         attachments: list=None) -> bool:
+        """
+        Updates a document and adds or replaces attachments in a single multipart/related request. Attachments
+        already on the document which are not replaced are kept.
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param value: the CouchDBDocument to be updated, its json must carry the current _rev
+        :param attachments: A list of CouchDBAttachment objects to add or replace
+        :return: True if updated, False otherwise
+        """
+
+        document = json.loads(self.__codecs.dumps(value.json), object_pairs_hook=collections.OrderedDict)
+        req = self.__send_multipart(database_name, value.id, document, attachments)
+        status_code = req.status_code
+        result = False
+
+        if status_code == 200 or status_code == 201 or status_code == 202:
+
+            value.rev = req.json()["rev"]
+            result = True
+
+        elif self.__throw_errors is True:
+
+            self.__raise_multipart_error(req)
+
+        return result
+
+    def __send_multipart(self,
+                         database_name: string=None,
+                         doc_id: string=None,
+                         document: dict=None,
+                         attachments: list=None) -> requests.Response:
+        boundary = uuid.uuid4().hex
+        delimiter = b"--" + boundary.encode("ascii")
+        stubs = collections.OrderedDict()
+
+        # attachments already stored stay as stubs, CouchDB matches the following parts to the remaining entries
+        for name, stub in (document.get("_attachments") or dict()).items():
+            if name not in [attachment.name for attachment in attachments]:
+                stubs[name] = {"stub": True}
+
+        for attachment in attachments:
+            stubs[attachment.name] = {"follows": True,
+                                      "content_type": attachment.content_type,
+                                      "length": len(attachment.data)}
+
+        document["_attachments"] = stubs
+
+        body = list()
+        body.append(delimiter + b"\r\nContent-Type: application/json\r\n\r\n")
+        body.append(self.__codecs.dumps(document).encode("utf-8"))
+
+        for attachment in attachments:
+            body.append(b"\r\n" + delimiter + b"\r\n")
+            body.append(("Content-Type: " + attachment.content_type + "\r\n").encode("utf-8"))
+            body.append(("Content-Disposition: attachment; filename=\"" + attachment.name + "\"\r\n\r\n")
+                        .encode("utf-8"))
+            body.append(attachment.data)
+
+        body.append(b"\r\n" + delimiter + b"--")
+
+        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
+        headers = {"Content-Type": "multipart/related; boundary=\"" + boundary + "\""}
+
+        return self.__send("PUT", command_text, data=b"".join(body), headers=headers)
+
+    def __raise_multipart_error(self, req: requests.Response=None):
+        status_code = req.status_code
+        json_result = json.loads(req.text)
+        error = json_result["error"]
+        reason = json_result["reason"]
+
+        cdb_error = CouchDBError()
+        cdb_error.description = "[" + error + "]" + reason
+
+        if status_code == 400:
+            cdb_error.title = "400 Bad Request – Invalid request body or parameters"
+        elif status_code == 401:
+            cdb_error.title = "401 Unauthorized – Write privileges required"
+        elif status_code == 404:
+            cdb_error.title = "404 Not Found – Specified database or document ID doesn’t exists"
+        elif status_code == 409:
+            cdb_error.title = "409 Conflict – Document with the specified ID already exists or specified revision" \
+                              " is not latest for target document"
+        else:
+            cdb_error.title = "Unknown error was encountered"
+
+        raise cdb_error
+
+    @staticmethod
+    def __read_multipart(req: requests.Response=None):
+        # yields (headers, body) for each part as it is read from the socket, so no part is held twice in memory
+        boundary = re.search(r'boundary="?([^";]+)"?', req.headers["Content-Type"]).group(1)
+        delimiter = b"--" + boundary.encode("ascii")
+        chunks = req.iter_content(chunk_size=65536)
+        buffer = bytearray()
+
+        def read_until(marker):
+            searched = 0
+
+            while True:
+                index = buffer.find(marker, searched)
+
+                if index >= 0:
+                    value = bytes(buffer[:index])
+                    del buffer[:index + len(marker)]
+                    return value
+
+                searched = max(0, len(buffer) - len(marker) + 1)
+                chunk = next(chunks, None)
+
+                if chunk is None:
+                    raise ValueError("Multipart response ended unexpectedly")
+
+                buffer.extend(chunk)
+
+        read_until(delimiter)
+
+        while True:
+            while len(buffer) < 2:
+                chunk = next(chunks, None)
+
+                if chunk is None:
+                    return
+
+                buffer.extend(chunk)
+
+            if buffer[:2] == b"--":
+                return
+
+            read_until(b"\r\n")
+            headers = dict()
+
+            for line in read_until(b"\r\n\r\n").decode("utf-8").split("\r\n"):
+                name, _, header_value = line.partition(":")
+                headers[name.strip().lower()] = header_value.strip()
+
+            yield headers, read_until(b"\r\n" + delimiter)
+
+    @staticmethod
+    def __read_attachments(json_result: dict=None, parts: object=None) -> list:
+        stubs = json_result.get("_attachments") or dict()
+        following = [name for name, stub in stubs.items() if stub.get("follows")]
+        received = dict()
+
+        if parts is not None:
+            for index, (headers, body) in enumerate(parts):
+                filename = re.search(r'filename="([^"]*)"', headers.get("content-disposition", ""))
+                received[filename.group(1) if filename else following[index]] = body
+
+        result = list()
+
+        for name, stub in stubs.items():
+            attachment = CouchDBAttachment(name=name, content_type=stub.get("content_type"))
+            attachment.digest = stub.get("digest")
+            attachment.length = stub.get("length")
+
+            if name in received:
+                attachment.data = received[name]
+            elif "data" in stub:
+                attachment.data = base64.b64decode(stub["data"])
+            else:
+                attachment.data = None
+
+            result.append(attachment)
+
+        return result
+
+    def retrieve_changes(self,
+                         database_name: string=None,
+                         since: object=None,
+                         limit: int=None,
+                         include_docs: bool=False,
+                         feed: string="normal",
+                         timeout: int=None,
+                         style: string=None) -> dict:
+        """
+        Retrieves the changes made to a database since a given sequence
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param since: The sequence to start after, None for the beginning of the database
+        :param limit: An integer setting the maximum number of changes to return
+        :param include_docs: True to include the changed document in each result
+        :param feed: normal to return immediately, longpoll to wait until a change happens
+        :param timeout: An integer setting the number of milliseconds a longpoll feed waits for a change
+        :param style: all_docs to list every leaf revision instead of only the winning one
+        :return: A dictionary with the results list and last_seq, None otherwise
+        """
+
+        #region Sample Req/Resp
+        # GET /somedatabase/_changes HTTP/1.0
+
+        # HTTP/1.1 200 OK
+        # Date: Fri, 8 May 2009 11:07:02 +0000GMT
+        # Content-Type: application/json
+        # Connection: close
+        #
+        # {"results":[
+        # {"seq":1,"id":"fresh","changes":[{"rev":"1-967a00dff5e02add41819138abb3284d"}]},
+        # {"seq":3,"id":"updated","changes":[{"rev":"2-7051cbe5c8faecd085a3fa619e6e6337"}]},
+        # {"seq":5,"id":"deleted","changes":[{"rev":"2-eec205a9d413992850a6e32678485900"}],"deleted":true}
+        # ],
+        # "last_seq":5}
+        #endregion
+
+        reader = self.__retrieve_changes_reader(database_name, since=since, limit=limit, include_docs=include_docs,
+                                                feed=feed, timeout=timeout, style=style)
+
+        if reader is None:
+            return None
+
+        results = list(reader)
+        result = reader.metadata
+        result["results"] = results
+
+        return result
+
+    def __retrieve_changes_reader(self,
+                                  database_name: string=None,
+                                  since: object=None,
+                                  limit: int=None,
+                                  include_docs: bool=False,
+                                  feed: string="normal",
+                                  timeout: int=None,
+                                  style: string=None) -> CouchDBRowReader:
+        result = None
+        command_text = self.__get_command_text("/" + database_name + "/_changes")
+        payload = {"since": since, "limit": limit, "feed": feed, "timeout": timeout, "style": style}
+
+        if include_docs:
+            payload["include_docs"] = "true"
+
+        req = self.__send("GET", command_text, params=payload, stream=True)
+        status_code = req.status_code
+
+        if status_code == 200:
+
+            result = CouchDBRowReader(req)
+
+        elif self.__throw_errors is True:
+
+            json_result = json.loads(req.text)
+            error = json_result["error"]
             reason = json_result["reason"]
 
-            if self.__throw_errors is True:
+            cdb_error = CouchDBError()
+            cdb_error.description = "[" + error + "]" + reason
+
+            if status_code == 400:
+                cdb_error.title = "400 Bad Request – Bad request"
+            else:
+                cdb_error.title = "Unknown error was encountered"
+
+            raise cdb_error
+
+        return result
+
+    def retrieve_document_revision_info(self, database_name: string=None, doc_id: string=None) -> list:
+        """
+        Retrieves a documents revision info
+
+        :param database_name: A string representation of the name of the CouchDB database
+        :param doc_id: A string representation of the Doc ID of the document within the CouchDB database
+        :return: None if no revision info found, otherwise a list of RevisionInfo objects for the given Document
+        """
+
+        #region Sample Req/Resp
+        #GET /somedatabase/some_doc_id?revs_info=true HTTP/1.0
+
+        # {
+        #   "_revs_info": [
+        #     {"rev": "3-ffffff", "status": "available"},
+        #     {"rev": "2-eeeeee", "status": "missing"},
+        #     {"rev": "1-dddddd", "status": "deleted"},
+        #   ]
+        # }
+        #endregion
+
+        result = None
+        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
+        payload = {"revs_info": "true"}
+        req = self.__send("GET", command_text, params=payload, coalesce=True)
+        status_code = req.status_code
+
+        if status_code == 200 or status_code == 201:
+
+            json_result = req.json()
+            revs_info = json_result["_revs_info"]
+
+            result = list()
+
+            for ri in revs_info:
+
+                current_rev = ri["rev"]
+                current_status = ri["status"]
+
+                cri = RevisionInfo()
+                cri.rev = current_rev
+
+                if current_status == RevisionInfoStatus.Available.value:
+                    cri.status = RevisionInfoStatus.Available
+                elif current_status == RevisionInfoStatus.Deleted.value:
+                    cri.status = RevisionInfoStatus.Deleted
+                elif current_status == RevisionInfoStatus.Missing.value:
+                    cri.status = RevisionInfoStatus.Missing
+                else:
+                    cri.status = RevisionInfoStatus.Unknown
+
+                result.append(cri)
+
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            error = json_result["error"]
+            reason = json_result["reason"]
+
+            cdb_error = CouchDBError()
+            cdb_error.title = "Unknown error was encountered"
+            cdb_error.description = "[" + error + "]" + reason
+            raise cdb_error
+
+        return result
+
+    def update_document(self, database_name: string=None, value: CouchDBDocument=None) -> bool:
+        """
+        Updates an existing CoucbDB document in the database
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param value: the CoucbDBDocument to be updated
+        :return: True if updated, False otherwise
+        """
+
+        #region Sample Req/Resp
+        # PUT /somedatabase/some_doc_id HTTP/1.0
+        # Content-Length: 245
+        # Content-Type: application/json
+
+        # {
+        #   "Subject":"I like Plankton",
+        #   "Author":"Rusty",
+        #   "PostedDate":"2006-08-15T17:30:12-04:00",
+        #   "Tags":["plankton", "baseball", "decisions"],
+        #   "Body":"I decided today that I don't like baseball. I like plankton."
+        # }
+        #endregion
+
+        result = False
+        command_text = self.__get_command_text("/" + database_name + "/" + value.id)
+        jsn = self.__codecs.dumps(value.json, sort_keys=True, indent="\t")
+        req = self.__send("PUT", command_text, data=jsn, headers={"Content-Type": "application/json"})
+        status_code = req.status_code
+
+        if status_code == 200 or status_code == 201:
+            result = True
+
+        elif self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            error = json_result["error"]
+            reason = json_result["reason"]
+
+            cdb_error = CouchDBError()
+            cdb_error.title = "Unknown error was encountered"
+            cdb_error.description = "[" + error + "]" + reason
+            raise cdb_error
+
+        return result
+
+    def patch_document(self,
+                       database_name: string=None,
+                       doc_id: string=None,
+                       operations: list=None,
+                       retries: int=3) -> string:
+        """
+        Changes fields of a document on the server in one small request instead of sending the whole document. The
+        update handler applying the changes is installed in the database on first use.
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param doc_id: A string representation of the document ID
+        :param operations: A list of operation tuples applied in order, each one of ("set", path, value),
+        ("increment", path, amount), ("append", path, value) or ("remove", path). A path is a dotted string such as
+        "stats.views" or a list of keys, missing objects along the way are created except by a remove.
+        :param retries: An integer setting how often a patch is repeated when a concurrent write conflicts with it
+        :return: The new revision of the document, None otherwise
+        """
+
+        #region Sample Req/Resp
+        # PUT /somedatabase/_design/couchdb_py_patch_v2/_update/patch/some_doc_id HTTP/1.0
+        # Content-Type: application/json
+        #
+        # [{"op": "increment", "path": ["stats", "views"], "value": 1}]
+
+        # HTTP/1.1 201 Created
+        # X-Couch-Update-NewRev: 4-7051cbe5c8faecd085a3fa619e6e6337
+        #
+        # {"ok": true, "id": "some_doc_id"}
+        #endregion
+
+        body = list()
+
+        for operation in operations:
+            path = operation[1].split(".") if isinstance(operation[1], str) else list(operation[1])
+            patch = {"op": operation[0], "path": path}
+
+            if len(operation) > 2:
+                patch["value"] = operation[2]
+
+            body.append(patch)
+
+        command_text = self.__get_command_text("/" + database_name + "/_design/" + self.__patch_design +
+                                               "/_update/patch/" + doc_id)
+        jsn = self.__codecs.dumps(body)
+
+        for attempt in range(retries + 2):
+            if database_name not in self.__patch_installed and not self.__install_patch_handler(database_name):
+                return None
+
+            req = self.__send("PUT", command_text, data=jsn, headers={"Content-Type": "application/json"})
+            status_code = req.status_code
+
+            if status_code == 200 or status_code == 201 or status_code == 202:
+                return req.headers.get("X-Couch-Update-NewRev")
+
+            json_result = json.loads(req.text)
+
+            if status_code == 404 and json_result.get("reason") != "document missing" and attempt == 0:
+                # the design document was deleted since it was installed
+                self.__patch_installed.discard(database_name)
+            elif status_code != 409 or attempt > retries:
+                break
+
+        if self.__throw_errors is True:
+            cdb_error = CouchDBError()
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+
+            if status_code == 400:
+                cdb_error.title = "400 Bad Request – Invalid patch operation"
+            elif status_code == 404:
+                cdb_error.title = "404 Not Found – Specified database or document ID doesn’t exists"
+            elif status_code == 409:
+                cdb_error.title = "409 Conflict – Document kept changing while the patch was applied"
+            else:
+                cdb_error.title = "Unknown error was encountered"
+
+            raise cdb_error
+
+        return None
+
+    def patch_documents(self, database_name: string=None, patches: dict=None, workers: int=8) -> dict:
+        """
+        Patches many documents at the same time, see patch_document for the operations
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param patches: A dictionary of document ID to its list of operation tuples
+        :param workers: An integer setting the number of documents patched at the same time
+        :return: A dictionary of document ID to its new revision, None for documents that failed
+        """
+
+        # installing up front keeps the workers from racing to create the design document
+        if database_name not in self.__patch_installed and not self.__install_patch_handler(database_name):
+            return {doc_id: None for doc_id in patches}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {doc_id: self.__submit(executor, self.patch_document, database_name, doc_id, operations)
+                       for doc_id, operations in patches.items()}
+
+            return {doc_id: future.result() for doc_id, future in futures.items()}
+
+    def __install_patch_handler(self, database_name: string=None) -> bool:
+        command_text = self.__get_command_text("/" + database_name + "/_design/" + self.__patch_design)
+        jsn = json.dumps({"language": "javascript", "updates": {"patch": _patch_handler}})
+        req = self.__send("PUT", command_text, data=jsn, headers={"Content-Type": "application/json"})
+        status_code = req.status_code
+
+        # the design document name carries the handler version, so an existing one is the same handler
+        if status_code == 201 or status_code == 202 or status_code == 409:
+            self.__patch_installed.add(database_name)
+            return True
+
+        if self.__throw_errors is True:
+            json_result = json.loads(req.text)
+            cdb_error = CouchDBError()
+            cdb_error.title = "Unable to install the patch update handler"
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+            raise cdb_error
+
+        return False
+
+    def delete_document(self, database_name: string=None, doc_id: string=None, rev_id: string=None) -> bool:
+        """
+        Deletes a given CoucbDB document based on the doc and rev ID
+
+        :param database_name: A string representation of the name of the database
+        :param doc_id: A string representation of the doc id
+        :param rev_id: A string representation of the rev id (revision)
+        :return: True if deleted, false otherwise
+        """
+
+        #region Sample Req/Resp
+        # DELETE /somedatabase/some_doc HTTP/1.0
+        # If-Match: "1582603387"
+
+        # HTTP/1.1 200 OK
+        # Etag: "2839830636"
+        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+        # Content-Type: application/json
+        # Connection: close
+        #
+        # {"ok":true,"rev":"2839830636"}
+        #endregion
+
+        result = False
+
+        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
+        payload = {"rev": rev_id}
+        req = self.__send("DELETE", command_text, params=payload)
+        status_code = req.status_code
+
+        if status_code == 200 or status_code == 201 or status_code == 202:
+
+            result = True
+
+        elif self.__throw_errors is True:
+
+            cdb_error = CouchDBError()
+
+            if status_code == 400:
+                cdb_error.title = "400 Bad Request – Invalid request body or parameters"
+            elif status_code == 401:
+                cdb_error.title = "401 Unauthorized – Write privileges required"
+            elif status_code == 404:
+                cdb_error.title = "404 Not Found – Specified database or document ID doesn’t exists"
+            elif status_code == 409:
+                cdb_error.title = "409 Conflict – Specified revision is not the latest for target document"
+
+            raise cdb_error
+
+        return result
 
-                cdb_error = CouchDBError()
-                cdb_error.description = "[" + error + "] " + reason
+    def retrieve_all_documents(self, database_name: string=None) -> list:
+        """
+        Retrieves all documents in the CouchDB
+        :param database_name: A string representation of the CouchDB database name
+        :return: Retrieves a list of dictionaries containing every documents key and latest revision in the CouchDB
+        """
 
-                if status_code == 400:
-                    cdb_error.title = "400 Bad Request – Invalid database name"
-                elif status_code == 401:
-                    cdb_error.title = "401 Unauthorized – CouchDB Server Administrator privileges required"
-                elif status_code == 404:
-                    cdb_error.title = "404 Not Found – Database doesn’t exist"
-                else:
-                    cdb_error.title = "An unknown status code was encountered : " + status_code
+        #region Sample Req / Resp
+        #GET /somedatabase/_all_docs HTTP/1.0
 
-                raise cdb_error
+        # HTTP/1.1 200 OK
+        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+        # Content-Type: application/json
+        # Connection: close
+        #
+        # {
+        #   "total_rows": 3, "offset": 0, "rows": [
+        #     {"id": "doc1", "key": "doc1", "value": {"rev": "4324BB"}},
+        #     {"id": "doc2", "key": "doc2", "value": {"rev":"2441HF"}},
+        #     {"id": "doc3", "key": "doc3", "value": {"rev":"74EC24"}}
+        #   ]
+        # }
+        #endregion
 
-        return result
+        return self.retrieve_all_documents_between(database_name=database_name)
 
-    def retrieve_all_databases(self) -> list:
+    def retrieve_all_documents_between(self,
+                                       database_name: string=None,
+                                       start_key: string=None,
+                                       end_key: string=None,
+                                       descending: bool=None,
+                                       limit: int=None,
+                                       columns: list=None) -> object:
         """
-        Retrieve all databases found in CouchDB
+        Retrieves all documents based on certain criteria
 
-        :return: A list of strings representing the name for each database, None otherwise
+        :param database_name: A string representation of the database name in CouchDB
+        :param start_key: A string representation of the start key of the document in CouchDB
+        :param end_key: A string representation of the end key of the document in CouchDB
+        :param descending: True to sort descending, false for ascending, Otherwise None for as it comes
+        :param limit: An integer setting the limit of documents to return
+        :param columns: A list of row fields such as "id" and "value.rev" to decode into a CouchDBColumns instead
+        :return: Empty list of nothing found, otherwise a list of document ID's and Rev's based on the criteria, or
+        a CouchDBColumns when columns are given
         """
 
         #region Sample Req/Resp
-        #GET /_all_dbs
+        # GET /somedatabase/_all_docs?startkey="doc2"&limit=2 HTTP/1.0
+        # GET /somedatabase/_all_docs?startkey="doc2"&endkey="doc3" HTTP/1.0
+        # GET /somedatabase/_all_docs?startkey="doc2"&limit=2&descending=true HTTP/1.0
 
         # HTTP/1.1 200 OK
-        # Cache-Control: must-revalidate
-        # Content-Length: 52
+        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
         # Content-Type: application/json
-        # Date: Sat, 10 Aug 2013 06:57:48 GMT
-        # Server: CouchDB (Erlang/OTP)
+        # Connection: close
         #
-        # [
-        #    "_users",
-        #    "contacts",
-        #    "docs",
-        #    "invoices",
-        #    "locations"
-        # ]
+        # {
+        #   "total_rows": 3, "offset": 1, "rows": [
+        #     {"id": "doc2", "key": "doc2", "value": {"rev":"2441HF"}},
+        #     {"id": "doc3", "key": "doc3", "value": {"rev":"74EC24"}}
+        #   ]
+        # }
         #endregion
 
-        command_text = self.__get_command_text("/_all_dbs")
-        req = requests.get(command_text)
+        result = list() if columns is None else CouchDBColumns(columns)
+
+        command_text = self.__get_command_text("/" + database_name + "/_all_docs")
+        payload = {"startkey": start_key, "endkey": end_key, "descending": descending, "limit": limit}
+        req = self.__send("GET", command_text, params=payload, stream=True, coalesce=True)
         status_code = req.status_code
-        result = None
 
-        if status_code == 200:
-            result = req.json()
+        if status_code == 200 and columns is not None:
+
+            result.extend(CouchDBRowReader(req))
+
+        elif status_code == 200:
+
+            for doc in CouchDBRowReader(req):
+                current_id = doc["id"]
+                current_rev = doc["value"]["rev"]
+                d = dict()
+                d["id"] = current_id
+                d["rev"] = current_rev
+                result.append(d)
+
         elif self.__throw_errors is True:
+
             json_result = json.loads(req.text)
             error = json_result["error"]
             reason = json_result["reason"]
+
             cdb_error = CouchDBError()
-            cdb_error.title = "Unknown status code encountered : " + status_code
+            cdb_error.title = "Unknown error was encountered"
             cdb_error.description = "[" + error + "]" + reason
+
             raise cdb_error
 
         return result
 
-    def retrieve_database(self, database_name: string=None) -> CouchDB:
+    def retrieve_all_documents_columns(self,
+                                       database_name: string=None,
+                                       columns: list=None,
+                                       start_key: string=None,
+                                       end_key: string=None,
+                                       include_docs: bool=False,
+                                       page_size: int=1000) -> CouchDBColumns:
         """
-        Retrieves the basic information related to a CoucbDB database
+        Streams _all_docs a page at a time into columns, so only one page of rows is held as dictionaries
 
-        :param database_name: a string representation of the database name in CouchDB to retrieve
-        :return: A CoucbDB object if found, None otherwise
+        :param database_name: A string representation of the database name in CouchDB
+        :param columns: A list of row fields such as "id", "value.rev" or "doc.amount" to decode
+        :param start_key: A string representation of the first document key to return
+        :param end_key: A string representation of the last document key to return
+        :param include_docs: True to include the document body so its fields can be decoded
+        :param page_size: An integer setting the number of rows fetched per request
+        :return: A populated CouchDBColumns
+        """
+
+        result = CouchDBColumns(columns)
+        result.extend(self.iterate_all_documents(database_name,
+                                                 start_key=start_key,
+                                                 end_key=end_key,
+                                                 include_docs=include_docs,
+                                                 page_size=page_size))
+
+        return result
+
+    def iterate_all_documents(self,
+                              database_name: string=None,
+                              start_key: string=None,
+                              end_key: string=None,
+                              inclusive_end: bool=True,
+                              include_docs: bool=False,
+                              attachments: bool=False,
+                              page_size: int=1000):
+        """
+        Reads the rows of _all_docs one page at a time so a whole database can be walked with only one page in memory
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param start_key: A string representation of the first document key to return
+        :param end_key: A string representation of the last document key to return
+        :param inclusive_end: True to include the end key itself, False to stop just before it
+        :param include_docs: True to include the document body in each row
+        :param attachments: True to inline attachment data in each included document
+        :param page_size: An integer setting the number of rows fetched per request
+        :return: A generator of the raw _all_docs row dictionaries
         """
 
         #region Sample Req/Resp
-        # GET /receipts HTTP/1.1
-        # Accept: application/json
-        # Host: localhost:5984
+        # GET /somedatabase/_all_docs?startkey="doc2"&endkey="doc9"&limit=1001&include_docs=true HTTP/1.0
 
-        # HTTP/1.1 200 OK
-        # Cache-Control: must-revalidate
-        # Content-Length: 258
-        # Content-Type: application/json
-        # Date: Mon, 12 Aug 2013 01:38:57 GMT
-        # Server: CouchDB (Erlang/OTP)
-        #
         # {
-        #     "committed_update_seq": 292786,
-        #     "compact_running": false,
-        #     "data_size": 65031503,
-        #     "db_name": "receipts",
-        #     "disk_format_version": 6,
-        #     "disk_size": 137433211,
-        #     "doc_count": 6146,
-        #     "doc_del_count": 64637,
-        #     "instance_start_time": "1376269325408900",
-        #     "purge_seq": 0,
-        #     "update_seq": 292786
+        #   "total_rows": 9, "offset": 1, "rows": [
+        #     {"id": "doc2", "key": "doc2", "value": {"rev":"2441HF"}, "doc": {...}},
+        #     ...
+        #   ]
         # }
         #endregion
 
-        command_text = self.__get_command_text("/" + database_name)
-        req = requests.get(command_text)
+        next_key = start_key
+
+        while True:
+            # one extra row is requested so its key can start the next page without using skip
+            rows = self.__retrieve_all_documents_page(database_name=database_name,
+                                                      start_key=next_key,
+                                                      end_key=end_key,
+                                                      inclusive_end=inclusive_end,
+                                                      include_docs=include_docs,
+                                                      attachments=attachments,
+                                                      limit=page_size + 1)
+
+            if rows is None:
+                return
+
+            # the page is read and closed before its rows are handed out, so no request slot stays held while the
+            # caller sends requests of its own between rows
+            for row in rows[:page_size]:
+                yield row
+
+            if len(rows) <= page_size:
+                return
+
+            next_key = rows[page_size]["key"]
+
+    def __retrieve_all_documents_page(self,
+                                      database_name: string=None,
+                                      start_key: string=None,
+                                      end_key: string=None,
+                                      inclusive_end: bool=True,
+                                      include_docs: bool=False,
+                                      attachments: bool=False,
+                                      limit: int=None,
+                                      skip: int=None) -> list:
+        command_text = self.__get_command_text("/" + database_name + "/_all_docs")
+        payload = {"limit": limit, "skip": skip}
+
+        if start_key is not None:
+            payload["startkey"] = json.dumps(start_key)
+        if end_key is not None:
+            payload["endkey"] = json.dumps(end_key)
+            payload["inclusive_end"] = json.dumps(inclusive_end)
+        if include_docs:
+            payload["include_docs"] = "true"
+        if attachments:
+            payload["attachments"] = "true"
+
+        req = self.__send("GET", command_text, params=payload, stream=True, coalesce=True)
         status_code = req.status_code
         result = None
-        json_result = None
 
+        # the rows are decoded as they arrive and the response is closed once the page is read
         if status_code == 200:
-            json_result = req.json()
-            result = CouchDB()
-            result.committed_update_seq = json_result["committed_update_seq"]
-            result.compact_running = json_result["compact_running"]
-            result.data_size = json_result["data_size"]
-            result.db_name = json_result["db_name"]
-            result.disk_format_version = json_result["disk_format_version"]
-            result.disk_size = json_result["disk_size"]
-            result.doc_count = json_result["doc_count"]
-            result.doc_del_count = json_result["doc_del_count"]
-            result.instance_start_time = json_result["instance_start_time"]
-            result.purge_seq = json_result["purge_seq"]
-            result.update_seq = json_result["update_seq"]
+            result = list(CouchDBRowReader(req))
         elif self.__throw_errors is True:
             json_result = json.loads(req.text)
-            error = json_result["error"]
-            reason = json_result["reason"]
             cdb_error = CouchDBError()
-            cdb_error.title = "404 Not Found – Requested database not found"
-            cdb_error.description = "[" + error + "]" + reason
+            cdb_error.title = "Unknown error was encountered"
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
             raise cdb_error
 
         return result
 
-    def create_document(self, database_name: string=None, did: string=None, value: object=None) -> CouchDBDocument:
+    def bulk_update_documents(self,
+                              database_name: string=None,
+                              documents: list=None,
+                              new_edits: bool=True) -> list:
         """
-        Creates a document for the given CouchDB database provided
+        Creates, updates or deletes many documents in a single request through _bulk_docs
 
-        :param did: The document id if you wish to manually assign the ID to the document
-        :param value: The object to store as a document in CoucbDB
         :param database_name: A string representation of the database name in CouchDB
-        :return: The value provided as a parameter appended with doc_id and rev_id if either are None then create failed
+        :param documents: A list of document dictionaries, each optionally carrying _id, _rev and _deleted
+        :param new_edits: False to store the given revisions as-is, as replication and restores do
+        :return: A list with the per document result dictionaries, None otherwise
         """
 
         #region Sample Req/Resp
-        #PUT /somedatabase/some_doc_id HTTP/1.0
-        # Content-Length: 245
+        # POST /somedatabase/_bulk_docs HTTP/1.0
         # Content-Type: application/json
         #
-        # {
-        #   "Subject":"I like Plankton",
-        #   "Author":"Rusty",
-        #   "PostedDate":"2006-08-15T17:30:12-04:00",
-        #   "Tags":["plankton", "baseball", "decisions"],
-        #   "Body":"I decided today that I don't like baseball. I like plankton."
-        # }
+        # {"docs": [
+        #   {"_id": "doc1", "Subject": "I like Plankton"},
+        #   {"_id": "doc2", "_rev": "1-4324BB", "_deleted": true}
+        # ]}
 
         # HTTP/1.1 201 Created
-        # Etag: "946B7D1C"
-        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
-        # Content-Type: application/json
-        # Connection: close
-        #
-        # {"ok": true, "id": "some_doc_id", "rev": "946B7D1C"}
-
-        # HTTP/1.1 409 Conflict
-        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
-        # Content-Length: 33
-        # Connection: close
         #
-        # {"error":"conflict","reason":"Document update conflict."}
+        # [
+        #   {"ok": true, "id": "doc1", "rev": "1-967a00dff5e02add41819138abb3284d"},
+        #   {"id": "doc2", "error": "conflict", "reason": "Document update conflict."}
+        # ]
         #endregion
 
-        if did is None:
-            cdb_uid = self.retrieve_uuid()
-        else:
-            cdb_uid = did
-
         result = None
-        command_text = self.__get_command_text("/" + database_name + "/" + cdb_uid)
-        jsn = json.dumps(value, default=lambda o: o.__dict__, sort_keys=True, indent="\t")
-        req = requests.put(command_text, jsn)
+        command_text = self.__get_command_text("/" + database_name + "/_bulk_docs")
+        body = {"docs": documents}
+
+        if not new_edits:
+            body["new_edits"] = False
+
+        jsn = self.__codecs.dumps(body)
+        req = self.__send("POST", command_text, data=jsn, headers={"Content-Type": "application/json"})
         status_code = req.status_code
-        json_result = None
 
-        if status_code == 201:
+        if status_code == 201 or status_code == 200 or status_code == 202:
 
-            # 201 Created – Document created and stored on disk
-            json_result = req.json()
-            result = CouchDBDocument()
-            result.json = json_result
-            result.id = json_result["id"]
-            result.rev = json_result["rev"]
+            result = req.json()
+
+            # conflicts prove a document exists as much as successful writes do
+            self.__remember_document_ids(database_name, [row["id"] for row in result
+                                                         if "ok" in row or row.get("error") == "conflict"])
 
         elif self.__throw_errors is True:
 
@@ -541,371 +3799,570 @@ class NativeCouchDBManager(object):
             cdb_error = CouchDBError()
             cdb_error.description = "[" + error + "]" + reason
 
-            if status_code == 202:
-                cdb_error.title = "202 Accepted – Document data accepted, but not yet stored on disk"
-            elif status_code == 400:
-                cdb_error.title = "400 Bad Request – Invalid request body or parameters"
+            if status_code == 400:
+                cdb_error.title = "400 Bad Request – The request provided invalid JSON data"
             elif status_code == 401:
                 cdb_error.title = "401 Unauthorized – Write privileges required"
-            elif status_code == 404:
-                cdb_error.title = "404 Not Found – Specified database or document ID doesn’t exists"
-            elif status_code == 409:
-                cdb_error.title = "409 Conflict – Document with the specified ID already exists or specified revision" \
-                                  " is not latest for target document"
+            elif status_code == 417:
+                cdb_error.title = "417 Expectation Failed – Occurs when all_or_nothing option set as true and at " \
+                                  "least one document was rejected by validation function"
+            else:
+                cdb_error.title = "Unknown error was encountered"
+
+            raise cdb_error
+
+        return result
+
+    def create_id_filter(self,
+                         database_name: string=None,
+                         false_positive_rate: float=0.01,
+                         max_bytes: int=None,
+                         capacity: int=None,
+                         page_size: int=10000) -> CouchDBIdFilter:
+        """
+        Builds a filter of the document IDs in a database from a streamed _all_docs key scan, the filter is kept
+        current from the writes made through this manager and update_id_filter
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param false_positive_rate: the chance an unknown ID is reported as probably existing
+        :param max_bytes: the most memory the filter may use, None for no limit
+        :param capacity: the number of IDs to size the filter for, defaults to twice the current document count
+        :param page_size: An integer setting the number of keys fetched per request
+        :return: The filter, None otherwise
+        """
+
+        if capacity is None:
+            database = self.retrieve_database(database_name)
+
+            if database is None:
+                return None
+
+            capacity = max(1000, database.doc_count * 2)
+
+        # the sequence is taken before the scan so update_id_filter catches the writes made during it
+        changes = self.retrieve_changes(database_name, since="now", limit=1)
+
+        if changes is None:
+            return None
+
+        id_filter = CouchDBIdFilter(capacity=capacity, false_positive_rate=false_positive_rate, max_bytes=max_bytes)
+        id_filter.last_seq = changes.get("last_seq")
+
+        for row in self.iterate_all_documents(database_name, page_size=page_size):
+            id_filter.add(row["id"])
+
+        self.__id_filters[database_name] = id_filter
+
+        return id_filter
+
+    def retrieve_id_filter(self, database_name: string=None) -> CouchDBIdFilter:
+        """
+        Retrieves the document ID filter of a database
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: The filter built by create_id_filter, None otherwise
+        """
+
+        return self.__id_filters.get(database_name)
+
+    def update_id_filter(self, database_name: string=None, limit: int=10000) -> int:
+        """
+        Adds the document IDs created by other clients to a database filter by following _changes
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param limit: An integer setting the number of changes fetched per request
+        :return: The number of changes read, None otherwise
+        """
+
+        id_filter = self.__id_filters.get(database_name)
+
+        if id_filter is None:
+            return None
+
+        result = 0
+
+        while True:
+            changes = self.retrieve_changes(database_name, since=id_filter.last_seq, limit=limit)
+
+            if changes is None:
+                return None
+
+            for change in changes["results"]:
+                if not change.get("deleted", False):
+                    id_filter.add(change["id"])
+
+            id_filter.last_seq = changes["last_seq"]
+            result += len(changes["results"])
+
+            if len(changes["results"]) < limit:
+                return result
+
+    def delete_id_filter(self, database_name: string=None) -> bool:
+        """
+        Stops tracking the document IDs of a database
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: True if the database had a filter, False otherwise
+        """
+
+        return self.__id_filters.pop(database_name, None) is not None
+
+    def retrieve_existing_document_ids(self,
+                                       database_name: string=None,
+                                       doc_ids: list=None,
+                                       batch_size: int=1000) -> set:
+        """
+        Finds which of the given document IDs exist, the IDs the database filter has never seen are new without a
+        request and only the probable ones are verified in batches
 
-            raise cdb_error
+        :param database_name: A string representation of the database name in CouchDB
+        :param doc_ids: A list of document ID strings
+        :param batch_size: An integer setting the number of IDs verified per request
+        :return: A set of the IDs that exist and are not deleted, None otherwise
+        """
+
+        id_filter = self.__id_filters.get(database_name)
+        probable = list(doc_ids) if id_filter is None else [doc_id for doc_id in doc_ids if doc_id in id_filter]
+        result = set()
+
+        # without a filter every ID is verified and nothing is skipped or a false positive
+        if id_filter is not None:
+            self.__record_statistic("id_filter.skipped", len(doc_ids) - len(probable))
+            self.__record_statistic("id_filter.verified", len(probable))
+
+        for i in range(0, len(probable), batch_size):
+            revisions = self.retrieve_current_document_revisions(database_name, probable[i:i + batch_size])
+
+            if revisions is None:
+                return None
+
+            result.update(doc_id for doc_id, revision in revisions.items() if not revision["deleted"])
+
+        if id_filter is not None:
+            self.__record_statistic("id_filter.false_positives", len(probable) - len(result))
 
         return result
 
-    def retrieve_document(self,
-                          database_name: string=None,
-                          doc_id: string=None,
-                          rev_id: string=None,
-                          attachments: bool=False,
-                          revisions: bool=False,
-                          rev_info: bool=False) -> CouchDBDocument:
+    def __remember_document_ids(self, database_name: string=None, doc_ids: list=None):
+        id_filter = self.__id_filters.get(database_name)
+
+        if id_filter is not None:
+            for doc_id in doc_ids:
+                id_filter.add(doc_id)
+
+    def retrieve_current_document_revisions(self, database_name: string=None, doc_ids: list=None) -> dict:
         """
-        Retrieves a CouchDB document
+        Retrieves the current revision of many documents in a single request
 
-        :param database_name: A string representation of the name of the CouchDB database name
-        :param doc_id: A string representation of the document ID to be retrieved
-        :param rev_id: A string representation of hte revision ID to be retrieved for a given document ID
-        :param attachments: A boolean representation whether or not to retrieve the attachments for the CouchDBDocument
-        :return: Returns a populated CouchDBDocument if found, None otherwise
+        :param database_name: A string representation of the database name in CouchDB
+        :param doc_ids: A list of document ID strings
+        :return: A dictionary of document ID to a dictionary with rev and deleted, missing documents are left out,
+        None otherwise
         """
 
         #region Sample Req/Resp
-        #GET /somedatabase/some_doc_id HTTP/1.0
-        #GET /somedatabase/some_doc_id?attachments=true HTTP/1.0
-        #GET /somedatabase/some_doc_id?rev=946B7D1C HTTP/1.0
-
-        # HTTP/1.1 200 OK
-        # Etag: "946B7D1C"
-        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
+        # POST /somedatabase/_all_docs HTTP/1.0
         # Content-Type: application/json
-        # Content-Length: 256
-        # Connection: close
         #
+        # {"keys": ["doc1", "doc2", "doc3"]}
+
         # {
-        #  "_id":"some_doc_id",
-        #  "_rev":"946B7D1C",
-        #  "Subject":"I like Plankton",
-        #  "Author":"Rusty",
-        #  "PostedDate":"2006-08-15T17:30:12Z-04:00",
-        #  "Tags":["plankton", "baseball", "decisions"],
-        #  "Body":"I decided today that I don't like baseball. I like plankton."
+        #   "total_rows": 2, "offset": 0, "rows": [
+        #     {"id": "doc1", "key": "doc1", "value": {"rev": "4-4324BB"}},
+        #     {"id": "doc2", "key": "doc2", "value": {"rev": "2-2441HF", "deleted": true}},
+        #     {"key": "doc3", "error": "not_found"}
+        #   ]
         # }
         #endregion
 
         result = None
-        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
-        payload = {"attachments": attachments, "rev": rev_id}
-        req = requests.get(command_text, params=payload)
+        command_text = self.__get_command_text("/" + database_name + "/_all_docs")
+        req = self.__send("POST", command_text, data=json.dumps({"keys": doc_ids}),
+                          headers={"Content-Type": "application/json"}, stream=True)
         status_code = req.status_code
 
         if status_code == 200:
 
-            json_result = req.json()
-            cb_doc = CouchDBDocument()
-            cb_doc.id = json_result["_id"]
-            cb_doc.rev = json_result["_rev"]
-            cb_doc.json = json_result
-
-            if attachments:
-                # cb_doc.attachments
-                #TODO: add attachments
-                pass
-
-            if revisions:
-                # cb_doc.revisions
-                #TODO: add revisions
-                pass
-
-            if rev_info:
-                cb_doc.revs_info = self.retrieve_document_revision_info(database_name=database_name, doc_id=doc_id)
-
-            # cb_doc.conflicts
-            # cb_doc.deleted
-            # cb_doc.deleted_conflicts
-            # cb_doc.local_seq
+            result = dict()
 
-            result = cb_doc
+            for row in CouchDBRowReader(req):
+                if "value" in row:
+                    result[row["id"]] = {"rev": row["value"]["rev"], "deleted": row["value"].get("deleted", False)}
 
         elif self.__throw_errors is True:
 
             json_result = json.loads(req.text)
-            error = json_result["error"]
-            reason = json_result["reason"]
-
             cdb_error = CouchDBError()
-            cdb_error.description = "[" + error + "]" + reason
-
-            if status_code == 304:
-                cdb_error.title = "304 Not Modified – Document wasn’t modified since specified revision"
-            elif status_code == 400:
-                cdb_error.title = "400 Bad Request – The format of the request or revision was invalid"
-            elif status_code == 401:
-                cdb_error.title = "401 Unauthorized – Read privilege required"
-            elif status_code == 404:
-                cdb_error.title = "404 Not Found – Document not found"
-
+            cdb_error.title = "Unknown error was encountered"
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
             raise cdb_error
 
         return result
 
-    def retrieve_document_revision_info(self, database_name: string=None, doc_id: string=None) -> list:
+    def retrieve_documents(self, database_name: string=None, doc_ids: list=None) -> list:
         """
-        Retrieves a documents revision info
+        Retrieves many documents in a single request
 
-        :param database_name: A string representation of the name of the CouchDB database
-        :param doc_id: A string representation of the Doc ID of the document within the CouchDB database
-        :return: None if no revision info found, otherwise a list of RevisionInfo objects for the given Document
+        :param database_name: A string representation of the database name in CouchDB
+        :param doc_ids: A list of document ID strings
+        :return: A list of populated CouchDBDocument objects in the order of the IDs, None for missing or deleted
+        documents, None otherwise
         """
 
         #region Sample Req/Resp
-        #GET /somedatabase/some_doc_id?revs_info=true HTTP/1.0
+        # POST /somedatabase/_all_docs?include_docs=true HTTP/1.0
+        # Content-Type: application/json
+        #
+        # {"keys": ["doc1", "doc3"]}
 
         # {
-        #   "_revs_info": [
-        #     {"rev": "3-ffffff", "status": "available"},
-        #     {"rev": "2-eeeeee", "status": "missing"},
-        #     {"rev": "1-dddddd", "status": "deleted"},
+        #   "total_rows": 2, "offset": 0, "rows": [
+        #     {"id": "doc1", "key": "doc1", "value": {"rev": "4-4324BB"}, "doc": {"_id": "doc1", "_rev": "4-4324BB"}},
+        #     {"key": "doc3", "error": "not_found"}
         #   ]
         # }
         #endregion
 
         result = None
-        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
-        payload = {"revs_info": "true"}
-        req = requests.get(command_text, params=payload)
+        command_text = self.__get_command_text("/" + database_name + "/_all_docs")
+        req = self.__send("POST", command_text, params={"include_docs": "true"},
+                          data=json.dumps({"keys": doc_ids}), headers={"Content-Type": "application/json"},
+                          stream=True)
         status_code = req.status_code
 
-        if status_code == 200 or status_code == 201:
-
-            json_result = req.json()
-            revs_info = json_result["_revs_info"]
+        if status_code == 200:
 
             result = list()
 
-            for ri in revs_info:
-
-                current_rev = ri["rev"]
-                current_status = ri["status"]
+            for row in CouchDBRowReader(req):
+                json_result = row.get("doc")
 
-                cri = RevisionInfo()
-                cri.rev = current_rev
-
-                if current_status == RevisionInfoStatus.Available.value:
-                    cri.status = RevisionInfoStatus.Available
-                elif current_status == RevisionInfoStatus.Deleted.value:
-                    cri.status = RevisionInfoStatus.Deleted
-                elif current_status == RevisionInfoStatus.Missing.value:
-                    cri.status = RevisionInfoStatus.Missing
-                else:
-                    cri.status = RevisionInfoStatus.Unknown
+                if json_result is None:
+                    result.append(None)
+                    continue
 
-                result.append(cri)
+                cb_doc = CouchDBDocument()
+                cb_doc.id = json_result["_id"]
+                cb_doc.rev = json_result["_rev"]
+                cb_doc.json = json_result
+                cb_doc.value = self.__codecs.decode(json_result)
+                result.append(cb_doc)
 
         elif self.__throw_errors is True:
-            json_result = json.loads(req.text)
-            error = json_result["error"]
-            reason = json_result["reason"]
 
+            json_result = json.loads(req.text)
             cdb_error = CouchDBError()
             cdb_error.title = "Unknown error was encountered"
-            cdb_error.description = "[" + error + "]" + reason
+            cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
             raise cdb_error
 
         return result
 
-    def update_document(self, database_name: string=None, value: CouchDBDocument=None) -> bool:
+    def purge_documents(self, database_name: string=None, revisions: dict=None) -> dict:
         """
-        Updates an existing CoucbDB document in the database
+        Permanently removes document revisions from a database, leaving no tombstone behind. Purged documents are
+        not replicated, so purge every replica that must forget them.
 
         :param database_name: A string representation of the database name in CouchDB
-        :param value: the CoucbDBDocument to be updated
-        :return: True if updated, False otherwise
+        :param revisions: A dictionary of document ID to a list of the revision strings to purge
+        :return: A dictionary of the purged document IDs to their purged revisions, None otherwise
         """
 
         #region Sample Req/Resp
-        # PUT /somedatabase/some_doc_id HTTP/1.0
-        # Content-Length: 245
+        # POST /somedatabase/_purge HTTP/1.0
         # Content-Type: application/json
+        #
+        # {"doc1": ["4-4324BB"], "doc2": ["2-2441HF"]}
 
-        # {
-        #   "Subject":"I like Plankton",
-        #   "Author":"Rusty",
-        #   "PostedDate":"2006-08-15T17:30:12-04:00",
-        #   "Tags":["plankton", "baseball", "decisions"],
-        #   "Body":"I decided today that I don't like baseball. I like plankton."
-        # }
+        # {"purge_seq": 3, "purged": {"doc1": ["4-4324BB"], "doc2": ["2-2441HF"]}}
         #endregion
 
-        result = False
-        command_text = self.__get_command_text("/" + database_name + "/" + value.id)
-        req = requests.put(command_text, data=value.json_text)
+        result = None
+        command_text = self.__get_command_text("/" + database_name + "/_purge")
+        req = self.__send("POST", command_text, data=json.dumps(revisions),
+                          headers={"Content-Type": "application/json"})
         status_code = req.status_code
 
-        if status_code == 200 or status_code == 201:
-            result = True
+        if status_code == 200 or status_code == 201 or status_code == 202:
+
+            result = req.json()["purged"]
 
         elif self.__throw_errors is True:
+
             json_result = json.loads(req.text)
             error = json_result["error"]
             reason = json_result["reason"]
 
             cdb_error = CouchDBError()
-            cdb_error.title = "Unknown error was encountered"
             cdb_error.description = "[" + error + "]" + reason
+
+            if status_code == 400:
+                cdb_error.title = "400 Bad Request – Invalid database name or JSON payload"
+            elif status_code == 401:
+                cdb_error.title = "401 Unauthorized – CouchDB Server Administrator privileges required"
+            elif status_code == 415:
+                cdb_error.title = "415 Unsupported Media Type – Bad Content-Type value"
+            else:
+                cdb_error.title = "Unknown error was encountered"
+
             raise cdb_error
 
         return result
 
-    def delete_document(self, database_name: string=None, doc_id: string=None, rev_id: string=None) -> bool:
+    def delete_documents(self,
+                         database_name: string=None,
+                         doc_ids: list=None,
+                         start_key: string=None,
+                         end_key: string=None,
+                         purge: bool=False,
+                         batch_size: int=1000,
+                         workers: int=1,
+                         progress=None) -> dict:
         """
-        Deletes a given CoucbDB document based on the doc and rev ID
+        Deletes many documents, either a list of IDs or every document in an _all_docs key range. Current revisions
+        are looked up in batches and the deletions are sent through _bulk_docs, or _purge when purging.
 
-        :param database_name: A string representation of the name of the database
-        :param doc_id: A string representation of the doc id
-        :param rev_id: A string representation of the rev id (revision)
-        :return: True if deleted, false otherwise
+        :param database_name: A string representation of the database name in CouchDB
+        :param doc_ids: A list of document ID strings, None to delete the key range instead
+        :param start_key: A string representation of the first document key to delete when no IDs are given
+        :param end_key: A string representation of the last document key to delete when no IDs are given
+        :param purge: True to permanently remove the documents instead of leaving tombstones
+        :param batch_size: An integer setting the number of documents deleted per request
+        :param workers: An integer setting the number of batches deleted at the same time
+        :param progress: A callable receiving the number of documents processed so far and the total if known
+        :return: A dictionary with the deleted, missing and failed document counts
         """
 
-        #region Sample Req/Resp
-        # DELETE /somedatabase/some_doc HTTP/1.0
-        # If-Match: "1582603387"
+        if doc_ids is not None:
+            total = len(doc_ids)
+            batches = (doc_ids[i:i + batch_size] for i in range(0, total, batch_size))
+        else:
+            total = None
+            batches = self.__batch_key_range(database_name=database_name,
+                                             start_key=start_key,
+                                             end_key=end_key,
+                                             batch_size=batch_size)
 
-        # HTTP/1.1 200 OK
-        # Etag: "2839830636"
-        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
-        # Content-Type: application/json
-        # Connection: close
-        #
-        # {"ok":true,"rev":"2839830636"}
-        #endregion
+        result = {"processed": 0, "deleted": 0, "missing": 0, "failed": 0}
+        pending = collections.deque()
 
-        result = False
+        def collect(future):
+            for name, count in future.result().items():
+                result[name] += count
 
-        command_text = self.__get_command_text("/" + database_name + "/" + doc_id)
-        payload = {"rev": rev_id}
-        req = requests.delete(command_text, params=payload)
-        status_code = req.status_code
+            if progress is not None:
+                progress(result["processed"], total)
 
-        if status_code == 200 or status_code == 201 or status_code == 202:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch in batches:
+                # only a bounded number of batches is held in memory however long the id list or key range is
+                if len(pending) >= workers:
+                    collect(pending.popleft())
 
-            result = True
+                pending.append(self.__submit(executor, self.__delete_batch, database_name, batch, purge))
 
-        elif self.__throw_errors is True:
+            while len(pending) > 0:
+                collect(pending.popleft())
 
-            cdb_error = CouchDBError()
+        return result
 
-            if status_code == 400:
-                cdb_error.title = "400 Bad Request – Invalid request body or parameters"
-            elif status_code == 401:
-                cdb_error.title = "401 Unauthorized – Write privileges required"
-            elif status_code == 404:
-                cdb_error.title = "404 Not Found – Specified database or document ID doesn’t exists"
-            elif status_code == 409:
-                cdb_error.title = "409 Conflict – Specified revision is not the latest for target document"
+    def __batch_key_range(self,
+                          database_name: string=None,
+                          start_key: string=None,
+                          end_key: string=None,
+                          batch_size: int=1000):
+        batch = dict()
+
+        for row in self.iterate_all_documents(database_name=database_name,
+                                              start_key=start_key,
+                                              end_key=end_key,
+                                              page_size=batch_size):
+            batch[row["id"]] = {"rev": row["value"]["rev"], "deleted": False}
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = dict()
+
+        if len(batch) > 0:
+            yield batch
+
+    def __delete_batch(self, database_name: string=None, batch: object=None, purge: bool=False) -> dict:
+        # key range batches already carry their revisions, id batches still need them looked up
+        if isinstance(batch, dict):
+            revisions = batch
+        else:
+            revisions = self.retrieve_current_document_revisions(database_name=database_name, doc_ids=batch)
 
-            raise cdb_error
+            if revisions is None:
+                return {"processed": len(batch), "deleted": 0, "missing": 0, "failed": len(batch)}
+
+        if not purge:
+            revisions = dict((did, info) for did, info in revisions.items() if not info["deleted"])
+
+        result = {"processed": len(batch), "deleted": 0, "missing": len(batch) - len(revisions), "failed": 0}
+
+        if len(revisions) == 0:
+            return result
+
+        if purge:
+            purged = self.purge_documents(database_name=database_name,
+                                          revisions=dict((did, [info["rev"]]) for did, info in revisions.items()))
+            deleted = 0 if purged is None else len(purged)
+        else:
+            tombstones = [{"_id": did, "_rev": info["rev"], "_deleted": True} for did, info in revisions.items()]
+            results = self.bulk_update_documents(database_name=database_name, documents=tombstones)
+            deleted = 0 if results is None else len([r for r in results if "error" not in r])
+
+        result["deleted"] = deleted
+        result["failed"] = len(revisions) - deleted
 
         return result
 
-    def retrieve_all_documents(self, database_name: string=None) -> list:
+    def retrieve_tombstone_statistics(self, database_name: string=None, page_size: int=10000) -> dict:
         """
-        Retrieves all documents in the CouchDB
-        :param database_name: A string representation of the CouchDB database name
-        :return: Retrieves a list of dictionaries containing every documents key and latest revision in the CouchDB
+        Walks the changes feed of a database to describe its tombstones and revision depths. Depths are counted in
+        power of two buckets and tombstones by age in tenths of the feed, the first tenth being the oldest.
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param page_size: An integer setting the number of changes fetched per request
+        :return: A dictionary with the document and tombstone counts, the deepest revision and the depth and age
+        distributions, None otherwise
         """
 
-        #region Sample Req / Resp
-        #GET /somedatabase/_all_docs HTTP/1.0
+        database = self.retrieve_database(database_name)
 
-        # HTTP/1.1 200 OK
-        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
-        # Content-Type: application/json
-        # Connection: close
-        #
-        # {
-        #   "total_rows": 3, "offset": 0, "rows": [
-        #     {"id": "doc1", "key": "doc1", "value": {"rev": "4324BB"}},
-        #     {"id": "doc2", "key": "doc2", "value": {"rev":"2441HF"}},
-        #     {"id": "doc3", "key": "doc3", "value": {"rev":"74EC24"}}
-        #   ]
-        # }
-        #endregion
+        if database is None:
+            return None
 
-        return self.retrieve_all_documents_between(database_name=database_name)
+        total = max(1, database.doc_count + database.doc_del_count)
+        result = {"documents": 0,
+                  "tombstones": 0,
+                  "max_depth": 0,
+                  "depths": collections.Counter(),
+                  "tombstone_depths": collections.Counter(),
+                  "tombstones_by_age": [0] * 10}
+        position = 0
 
-    def retrieve_all_documents_between(self,
-                                       database_name: string=None,
-                                       start_key: string=None,
-                                       end_key: string=None,
-                                       descending: bool=None,
-                                       limit: int=None) -> list:
+        for change in self.__iterate_changes(database_name, page_size=page_size):
+            if change is None:
+                return None
+
+            depth = int(change["changes"][0]["rev"].split("-", 1)[0])
+            bucket = 1 << (depth - 1).bit_length()
+            result["max_depth"] = max(result["max_depth"], depth)
+
+            if change.get("deleted", False):
+                result["tombstones"] += 1
+                result["tombstone_depths"][bucket] += 1
+                result["tombstones_by_age"][min(9, position * 10 // total)] += 1
+            else:
+                result["documents"] += 1
+                result["depths"][bucket] += 1
+
+            position += 1
+
+        result["depths"] = dict(result["depths"])
+        result["tombstone_depths"] = dict(result["tombstone_depths"])
+
+        return result
+
+    def purge_tombstones(self,
+                         database_name: string=None,
+                         until_seq: object=None,
+                         keep_recent: int=None,
+                         start_key: string=None,
+                         end_key: string=None,
+                         batch_size: int=500,
+                         progress=None) -> dict:
         """
-        Retrieves all documents based on certain criteria
+        Purges deleted documents found in the changes feed in bounded batches, optionally only the old ones or the
+        ones in a key range. Purges are not replicated, so purge every replica that must forget them.
 
         :param database_name: A string representation of the database name in CouchDB
-        :param start_key: A string representation of the start key of the document in CouchDB
-        :param end_key: A string representation of the end key of the document in CouchDB
-        :param descending: True to sort descending, false for ascending, Otherwise None for as it comes
-        :param limit: An integer setting the limit of documents to return
-        :return: Empty list of nothing found, otherwise a list of document ID's and Rev's based on the criteria
+        :param until_seq: The sequence after which tombstones are kept, None to consider the whole feed
+        :param keep_recent: An integer setting the number of most recent changes whose tombstones are kept
+        :param start_key: A string representation of the first document ID to purge
+        :param end_key: A string representation of the last document ID to purge
+        :param batch_size: An integer setting the number of tombstones purged per request
+        :param progress: A callable receiving the number of tombstones purged so far
+        :return: A dictionary with the scanned, purged and failed counts, None otherwise
         """
 
-        #region Sample Req/Resp
-        # GET /somedatabase/_all_docs?startkey="doc2"&limit=2 HTTP/1.0
-        # GET /somedatabase/_all_docs?startkey="doc2"&endkey="doc3" HTTP/1.0
-        # GET /somedatabase/_all_docs?startkey="doc2"&limit=2&descending=true HTTP/1.0
+        limit = None
 
-        # HTTP/1.1 200 OK
-        # Date: Thu, 17 Aug 2006 05:39:28 +0000GMT
-        # Content-Type: application/json
-        # Connection: close
-        #
-        # {
-        #   "total_rows": 3, "offset": 1, "rows": [
-        #     {"id": "doc2", "key": "doc2", "value": {"rev":"2441HF"}},
-        #     {"id": "doc3", "key": "doc3", "value": {"rev":"74EC24"}}
-        #   ]
-        # }
-        #endregion
+        if keep_recent is not None:
+            database = self.retrieve_database(database_name)
+
+            if database is None:
+                return None
 
-        result = list()
+            limit = database.doc_count + database.doc_del_count - keep_recent
 
-        command_text = self.__get_command_text("/" + database_name + "/_all_docs")
-        payload = {"startkey": start_key, "endkey": end_key, "descending": descending, "limit": limit}
-        req = requests.get(command_text, params=payload)
-        status_code = req.status_code
+        result = {"scanned": 0, "purged": 0, "failed": 0}
+        batch = dict()
 
-        if status_code == 200:
+        def flush():
+            purged = self.purge_documents(database_name, batch)
 
-            json_result = req.json()
+            if purged is None:
+                result["failed"] += len(batch)
+            else:
+                result["purged"] += len(purged)
+                result["failed"] += len(batch) - len(purged)
 
-            for doc in json_result["rows"]:
-                current_id = doc["id"]
-                current_rev = doc["value"]["rev"]
-                d = dict()
-                d["id"] = current_id
-                d["rev"] = current_rev
-                result.append(d)
+            batch.clear()
 
-        elif self.__throw_errors is True:
+            if progress is not None:
+                progress(result["purged"])
 
-            json_result = json.loads(req.text)
-            error = json_result["error"]
-            reason = json_result["reason"]
+        for change in self.__iterate_changes(database_name, page_size=batch_size * 4):
+            if change is None:
+                return None
 
-            cdb_error = CouchDBError()
-            cdb_error.title = "Unknown error was encountered"
-            cdb_error.description = "[" + error + "]" + reason
+            if limit is not None and result["scanned"] >= limit:
+                break
 
-            raise cdb_error
+            # sequences are compared by number, the exact until_seq may never come back from the feed
+            if until_seq is not None and _sequence_number(change["seq"]) > _sequence_number(until_seq):
+                break
+
+            result["scanned"] += 1
+            doc_id = change["id"]
+
+            if change.get("deleted", False) and (start_key is None or doc_id >= start_key) and \
+                    (end_key is None or doc_id <= end_key):
+                batch[doc_id] = [revision["rev"] for revision in change["changes"]]
+
+                if len(batch) >= batch_size:
+                    flush()
+
+        if batch:
+            flush()
 
         return result
 
+    def __iterate_changes(self, database_name: string=None, page_size: int=10000):
+        # a None change reports a failed page so callers can tell an error from the end of the feed
+        since = None
+
+        while True:
+            changes = self.__retrieve_changes_reader(database_name, since=since, limit=page_size)
+
+            if changes is None:
+                yield None
+                return
+
+            # the page is read and closed first, callers such as purge_tombstones send requests between changes
+            page = list(changes)
+
+            for change in page:
+                yield change
+
+            if len(page) < page_size:
+                return
+
+            since = changes.metadata["last_seq"]
+
     def create_document_attachment(self,
                                    database_name: string=None,
                                    doc_id: string=None,
@@ -935,9 +4392,17 @@ class NativeCouchDBManager(object):
 
         result = None
 
+        cached = self.__attachment_cache is not None and isinstance(attachment, bytes)
+
+        if cached:
+            if self.__is_attachment_unchanged(database_name, doc_id, rev_id, attachment_name, attachment):
+                # the stored attachment is identical, so the upload and the new revision are skipped
+                self.__record_statistic("attachment_cache.skipped_uploads", 1)
+                return rev_id
+
         command_text = self.__get_command_text("/" + database_name + "/" + doc_id + "/" + attachment_name)
         payload = {"rev": rev_id}
-        req = requests.put(url=command_text, params=payload, data=attachment)
+        req = self.__send("PUT", command_text, params=payload, data=attachment)
         status_code = req.status_code
 
         if status_code == 200 or status_code == 201 or status_code == 202:
@@ -946,6 +4411,9 @@ class NativeCouchDBManager(object):
             json_result = json.loads(json_text)
             result = json_result["rev"]
 
+            if cached:
+                self.__cache_uploaded_attachment(database_name, doc_id, result, attachment_name, attachment)
+
         elif self.__throw_errors is True:
 
             json_result = json.loads(req.text)
@@ -997,9 +4465,17 @@ class NativeCouchDBManager(object):
         #endregion
 
         result = None
+        cached = self.__attachment_cache is not None and isinstance(attachment, bytes)
+
+        if cached:
+            if self.__is_attachment_unchanged(database_name, doc_id, rev_id, attachment_name, attachment):
+                # the stored attachment is identical, so the upload and the new revision are skipped
+                self.__record_statistic("attachment_cache.skipped_uploads", 1)
+                return rev_id
+
         command_text = self.__get_command_text("/" + database_name + "/" + doc_id + "/" + attachment_name)
         payload = {"rev": rev_id}
-        req = requests.put(url=command_text, params=payload, data=attachment)
+        req = self.__send("PUT", command_text, params=payload, data=attachment)
         status_code = req.status_code
 
         if status_code == 200 or status_code == 201:
@@ -1007,6 +4483,9 @@ class NativeCouchDBManager(object):
             json_result = json.loads(json_text)
             result = json_result["rev"]
 
+            if cached:
+                self.__cache_uploaded_attachment(database_name, doc_id, result, attachment_name, attachment)
+
         return result
 
     def delete_document_attachment(self,
@@ -1034,7 +4513,7 @@ class NativeCouchDBManager(object):
 
         command_text = self.__get_command_text("/" + database_name + "/" + doc_id + "/" + attachment_name)
         payload = {"rev": rev_id}
-        req = requests.delete(command_text, params=payload)
+        req = self.__send("DELETE", command_text, params=payload)
         status_code = req.status_code
         json_text = req.text
         json_result = json.loads(json_text)
@@ -1070,14 +4549,17 @@ class NativeCouchDBManager(object):
                                      database_name: string=None,
                                      doc_id: string=None,
                                      rev_id: string=None,
-                                     attachment_name: string=None) -> CouchDBDocument:
+                                     attachment_name: string=None,
+                                     digest: string=None) -> CouchDBDocument:
         """
-        Retrieves a document attachment from the CouchDB server
+        Retrieves a document attachment from the CouchDB server, or from the attachment cache when its digest is
+        known or CouchDB confirms the cached copy is current
 
         :param database_name: A string representation of the name of the database in CouchDB
         :param doc_id: A string representation of the document ID in the CouchDB database
         :param rev_id: A string representation of the revision ID related to the document ID in CouchDB
         :param attachment_name: A string representation of the filename of the attachment associated to the document
+        :param digest: A string representation of the attachment digest from the document _attachments stub
         :return: A CouchDBDocument object containing the attachment, doc id and rev id
         """
 
@@ -1090,11 +4572,61 @@ class NativeCouchDBManager(object):
         #endregion
 
         result = None
+        cache = self.__attachment_cache
+        content = None
+        headers = None
+        status_code = 200
+
+        if cache is not None:
+            # an attachment never changes within a revision, only the latest revision needs confirming
+            if digest is None and rev_id is not None:
+                digest = cache.lookup((database_name, doc_id, rev_id, attachment_name))
+
+            if digest is not None:
+                content = cache.retrieve(digest)
+            else:
+                digest = cache.lookup((database_name, doc_id, None, attachment_name))
 
-        command_text = self.__get_command_text("/" + database_name + "/" + doc_id + "/" + attachment_name)
-        payload = {"rev": rev_id}
-        req = requests.get(command_text, params=payload)
-        status_code = req.status_code
+                if digest is not None:
+                    headers = {"If-None-Match": "\"" + digest.partition("-")[2] + "\""}
+
+        if content is None:
+            command_text = self.__get_command_text("/" + database_name + "/" + doc_id + "/" + attachment_name)
+            payload = {"rev": rev_id}
+            req = self.__send("GET", command_text, params=payload, headers=headers)
+            status_code = req.status_code
+
+            if status_code == 304 and headers is not None:
+                content = cache.retrieve(digest)
+
+                if content is None:
+                    # evicted since the digest was remembered
+                    req = self.__send("GET", command_text, params=payload)
+                    status_code = req.status_code
+                else:
+                    status_code = 200
+                    self.__record_statistic("attachment_cache.hits", 1)
+
+            if content is None and (status_code == 200 or status_code == 201):
+                content = req.content
+
+                if cache is not None:
+                    self.__record_statistic("attachment_cache.misses", 1)
+                    etag = req.headers.get("ETag")
+
+                    # the ETag is the digest of the stored bytes, which differ from the contents for the types
+                    # CouchDB compresses, so it is preferred over hashing the contents
+                    if etag is not None:
+                        digest = "md5-" + etag.strip("\"")
+                    else:
+                        digest = CouchDBAttachmentCache.digest_of(content)
+                    cache.store(digest, content)
+                    cache.remember((database_name, doc_id, rev_id, attachment_name), digest)
+
+                    if rev_id is None:
+                        cache.remember((database_name, doc_id, None, attachment_name), digest)
+        else:
+            self.__record_statistic("attachment_cache.hits", 1)
 
         if status_code == 200 or status_code == 201:
 
@@ -1102,7 +4634,7 @@ class NativeCouchDBManager(object):
             result.id = doc_id
             result.rev = rev_id
             result.attachments = list()
-            result.attachments.append(req.content)
+            result.attachments.append(content)
 
         elif self.__throw_errors is True:
 
@@ -1124,3 +4656,930 @@ class NativeCouchDBManager(object):
             raise cdb_error
 
         return result
+
+    def __retrieve_attachment_digest(self,
+                                     database_name: string=None,
+                                     doc_id: string=None,
+                                     rev_id: string=None,
+                                     attachment_name: string=None) -> string:
+        digest = self.__attachment_cache.lookup((database_name, doc_id, rev_id, attachment_name))
+
+        if digest is not None or rev_id is None:
+            return digest
+
+        # CouchDB sends the base64 md5 of an attachment as its ETag, a HEAD request reads it without the contents
+        command_text = self.__get_command_text("/" + database_name + "/" + doc_id + "/" + attachment_name)
+        req = self.__send("HEAD", command_text, params={"rev": rev_id})
+        etag = req.headers.get("ETag")
+
+        if req.status_code == 200 and etag is not None:
+            digest = "md5-" + etag.strip("\"")
+
+        return digest
+
+    def __is_attachment_unchanged(self,
+                                  database_name: string=None,
+                                  doc_id: string=None,
+                                  rev_id: string=None,
+                                  attachment_name: string=None,
+                                  attachment: bytes=None) -> bool:
+        digest = self.__retrieve_attachment_digest(database_name, doc_id, rev_id, attachment_name)
+
+        if digest is None:
+            return False
+
+        # a compressed attachment has a digest of its stored encoding, so the cached copy is compared instead
+        if digest == CouchDBAttachmentCache.digest_of(attachment):
+            return True
+
+        return self.__attachment_cache.retrieve(digest) == attachment
+
+    def __cache_uploaded_attachment(self,
+                                    database_name: string=None,
+                                    doc_id: string=None,
+                                    rev_id: string=None,
+                                    attachment_name: string=None,
+                                    attachment: bytes=None):
+        # the upload response carries no digest, so the one CouchDB computed over the stored bytes is read back
+        digest = self.__retrieve_attachment_digest(database_name, doc_id, rev_id, attachment_name)
+
+        if digest is None:
+            return
+
+        self.__attachment_cache.store(digest, attachment)
+        self.__attachment_cache.remember((database_name, doc_id, rev_id, attachment_name), digest)
+        self.__attachment_cache.remember((database_name, doc_id, None, attachment_name), digest)
+
+    def export_database(self,
+                        database_name: string=None,
+                        directory: string=None,
+                        shards: int=4,
+                        workers: int=4,
+                        attachments: bool=False,
+                        page_size: int=1000,
+                        resume: bool=True,
+                        progress=None) -> dict:
+        """
+        Exports a database to gzip compressed NDJSON shard files, one document per line. The _all_docs key space
+        is split into ranges which are dumped concurrently, one page at a time per worker.
+
+        :param database_name: A string representation of the database name in CouchDB
+        :param directory: A string representation of the directory the shard files are written to
+        :param shards: An integer setting the number of key ranges to split the database into
+        :param workers: An integer setting the number of shards exported at the same time
+        :param attachments: True to inline the attachment data in the exported documents
+        :param page_size: An integer setting the number of documents fetched and written per page
+        :param resume: True to continue a previous export from its checkpoint, False to start over
+        :param progress: A callable receiving the shard index and the number of documents exported for it so far
+        :return: A dictionary summarizing the export, None if the key space could not be read
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, database_name + ".manifest.json")
+        checkpoint_path = os.path.join(directory, database_name + ".export.checkpoint.json")
+
+        if resume and os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+        else:
+            ranges = self.__split_key_space(database_name=database_name, shards=shards)
+
+            if ranges is None:
+                return None
+
+            manifest = {"database": database_name, "attachments": attachments, "shards": list()}
+
+            for index, (start_key, end_key) in enumerate(ranges):
+                manifest["shards"].append({"file": "%s-%04d.ndjson.gz" % (database_name, index),
+                                           "start_key": start_key,
+                                           "end_key": end_key})
+
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent="\t", sort_keys=True)
+
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+
+        checkpoint = CouchDBTransferCheckpoint(checkpoint_path)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [self.__submit(executor,
+                                     self.__export_shard,
+                                     database_name,
+                                     directory,
+                                     index,
+                                     shard,
+                                     manifest["attachments"],
+                                     page_size,
+                                     checkpoint,
+                                     progress) for index, shard in enumerate(manifest["shards"])]
+            counts = [future.result() for future in futures]
+
+        result = dict()
+        result["database"] = database_name
+        result["files"] = [shard["file"] for shard in manifest["shards"]]
+        result["documents"] = sum(count for count in counts if count is not None)
+        result["complete"] = None not in counts
+
+        return result
+
+    def import_database(self,
+                        database_name: string=None,
+                        directory: string=None,
+                        source_database_name: string=None,
+                        workers: int=4,
+                        batch_size: int=500,
+                        resume: bool=True,
+                        progress=None) -> dict:
+        """
+        Imports the shard files written by export_database through chunked _bulk_docs requests. Revisions are kept
+        as exported (new_edits=false) so an import can safely be repeated.
+
+        :param database_name: A string representation of the database name in CouchDB to import into
+        :param directory: A string representation of the directory holding the shard files
+        :param source_database_name: A string representation of the exported database name, defaults to database_name
+        :param workers: An integer setting the number of shard files imported at the same time
+        :param batch_size: An integer setting the number of documents sent per _bulk_docs request
+        :param resume: True to continue a previous import from its checkpoint, False to start over
+        :param progress: A callable receiving the shard index and the number of documents imported for it so far
+        :return: A dictionary summarizing the import, with the number of documents _bulk_docs rejected under failed,
+        None if the export manifest was not found
+        """
+
+        if source_database_name is None:
+            source_database_name = database_name
+
+        manifest_path = os.path.join(directory, source_database_name + ".manifest.json")
+        checkpoint_path = os.path.join(directory, source_database_name + ".import." + database_name +
+                                       ".checkpoint.json")
+
+        if not os.path.exists(manifest_path):
+            if self.__throw_errors is True:
+                cdb_error = CouchDBError()
+                cdb_error.title = "Export manifest not found"
+                cdb_error.description = manifest_path
+                raise cdb_error
+            return None
+
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        if not resume and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        databases = self.retrieve_all_databases()
+
+        if databases is not None and database_name not in databases:
+            self.create_database(database_name=database_name)
+
+        checkpoint = CouchDBTransferCheckpoint(checkpoint_path)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [self.__submit(executor,
+                                     self.__import_shard,
+                                     database_name,
+                                     os.path.join(directory, shard["file"]),
+                                     index,
+                                     batch_size,
+                                     checkpoint,
+                                     progress) for index, shard in enumerate(manifest["shards"])]
+            counts = [future.result() for future in futures]
+
+        failed = sum(count[1] for count in counts if count is not None)
+
+        result = dict()
+        result["database"] = database_name
+        result["files"] = [shard["file"] for shard in manifest["shards"]]
+        result["documents"] = sum(count[0] for count in counts if count is not None) - failed
+        result["failed"] = failed
+        result["complete"] = None not in counts and failed == 0
+
+        return result
+
+    def __split_key_space(self, database_name: string=None, shards: int=1) -> list:
+        # boundaries are found by letting CouchDB skip over a range of keys, only one row travels per boundary
+        command_text = self.__get_command_text("/" + database_name + "/_all_docs")
+        req = self.__send("GET", command_text, params={"limit": 0}, coalesce=True)
+
+        if req.status_code != 200:
+            if self.__throw_errors is True:
+                json_result = json.loads(req.text)
+                cdb_error = CouchDBError()
+                cdb_error.title = "Unable to read the key space of the database"
+                cdb_error.description = "[" + json_result["error"] + "]" + json_result["reason"]
+                raise cdb_error
+            return None
+
+        total_rows = req.json()["total_rows"]
+        range_size = max(1, int(math.ceil(total_rows / max(1, shards))))
+        boundaries = list()
+
+        while len(boundaries) < shards - 1:
+            rows = self.__retrieve_all_documents_page(database_name=database_name,
+                                                      start_key=boundaries[-1] if boundaries else None,
+                                                      limit=1,
+                                                      skip=range_size)
+            if rows is None:
+                return None
+            if len(rows) == 0:
+                break
+
+            boundaries.append(rows[0]["key"])
+
+        starts = [None] + boundaries
+        ends = boundaries + [None]
+
+        return list(zip(starts, ends))
+
+    def __export_shard(self,
+                       database_name: string,
+                       directory: string,
+                       index: int,
+                       shard: dict,
+                       attachments: bool,
+                       page_size: int,
+                       checkpoint: CouchDBTransferCheckpoint,
+                       progress) -> int:
+        state = checkpoint.retrieve(index)
+        count = state.get("count", 0)
+
+        if state.get("done"):
+            return count
+
+        start_key = state.get("last_key", shard["start_key"])
+        skip = 1 if "last_key" in state else None
+
+        with open(os.path.join(directory, shard["file"]), "ab") as f:
+            # anything written after the last checkpoint belongs to an interrupted page and is discarded
+            f.truncate(state.get("offset", 0))
+
+            while True:
+                rows = self.__retrieve_all_documents_page(database_name=database_name,
+                                                          start_key=start_key,
+                                                          end_key=shard["end_key"],
+                                                          inclusive_end=False,
+                                                          include_docs=True,
+                                                          attachments=attachments,
+                                                          limit=page_size,
+                                                          skip=skip)
+                if rows is None:
+                    return None
+                if len(rows) == 0:
+                    break
+
+                documents = [row["doc"] for row in rows if row.get("doc") is not None]
+
+                # attachment stubs without their data would be rejected by a new_edits=false import
+                if not attachments:
+                    for document in documents:
+                        document.pop("_attachments", None)
+
+                lines = [json.dumps(document, separators=(",", ":")) + "\n" for document in documents]
+
+                # every page is its own gzip member so the file stays readable up to the last checkpoint
+                with gzip.GzipFile(fileobj=f, mode="wb") as gz:
+                    gz.write("".join(lines).encode("utf-8"))
+                f.flush()
+
+                start_key = rows[-1]["key"]
+                skip = 1
+                count += len(lines)
+                checkpoint.update(index, last_key=start_key, count=count, offset=f.tell())
+
+                if progress is not None:
+                    progress(index, count)
+
+                if len(rows) < page_size:
+                    break
+
+        checkpoint.update(index, count=count, done=True)
+
+        return count
+
+    def __import_shard(self,
+                       database_name: string,
+                       path: string,
+                       index: int,
+                       batch_size: int,
+                       checkpoint: CouchDBTransferCheckpoint,
+                       progress) -> tuple:
+        # returns the number of documents read and the number _bulk_docs rejected, None if a request failed
+        state = checkpoint.retrieve(index)
+        committed = state.get("count", 0)
+        failed = state.get("failed", 0)
+
+        if state.get("done"):
+            return committed, failed
+
+        count = 0
+        batch = list()
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                count += 1
+
+                if count <= committed:
+                    continue
+
+                batch.append(json.loads(line))
+
+                if len(batch) >= batch_size:
+                    results = self.bulk_update_documents(database_name=database_name, documents=batch,
+                                                         new_edits=False)
+
+                    if results is None:
+                        return None
+
+                    failed += sum(1 for row in results if "error" in row)
+                    batch = list()
+                    checkpoint.update(index, count=count, failed=failed)
+
+                    if progress is not None:
+                        progress(index, count)
+
+        if len(batch) > 0:
+            results = self.bulk_update_documents(database_name=database_name, documents=batch, new_edits=False)
+
+            if results is None:
+                return None
+
+            failed += sum(1 for row in results if "error" in row)
+
+            if progress is not None:
+                progress(index, count)
+
+        checkpoint.update(index, count=count, failed=failed, done=True)
+
+        return count, failed
+
+
+class CouchDBHealthSample(object):
+    database_name = string
+    sampled = datetime
+    update_seq = int
+    data_size = int
+    disk_size = int
+    doc_count = int
+    doc_del_count = int
+    compact_running = bool
+    write_rate = float
+    fragmentation = float
+
+
+class CouchDBHealthSampler(object):
+    """
+    Periodically samples the database information of a set of databases, keeping a short history of size, write
+    rate and fragmentation, and optionally compacts databases whose fragmentation exceeds a threshold while
+    inside a compaction window
+    """
+
+    __manager = None
+    __database_names = list
+    __interval = float
+    __fragmentation_threshold = float
+    __minimum_disk_size = int
+    __compaction_windows = list
+    __compaction_cooldown = float
+    __compact_views = bool
+    __samples = dict
+    __compactions = list
+    __last_compaction = dict
+    __lock = None
+    __stopped = None
+    __thread = None
+
+    def __init__(self,
+                 manager: NativeCouchDBManager=None,
+                 database_names: list=None,
+                 interval: float=60.0,
+                 history: int=60,
+                 fragmentation_threshold: float=None,
+                 minimum_disk_size: int=1048576,
+                 compaction_windows: list=None,
+                 compaction_cooldown: float=3600.0,
+                 compact_views: bool=True):
+        """
+        Initializes the health sampler
+
+        :param manager: the manager used to reach CouchDB
+        :param database_names: the names of the databases to sample
+        :param interval: the number of seconds between two samples
+        :param history: the number of samples kept per database
+        :param fragmentation_threshold: the fragmentation (0 to 1) above which compaction is triggered, None to never
+        :param minimum_disk_size: the disk size in bytes a database must reach before it is compacted
+        :param compaction_windows: a list of (datetime.time, datetime.time) tuples in which compaction may start,
+        None to allow compaction at any time
+        :param compaction_cooldown: the minimum number of seconds between two compactions of the same database
+        :param compact_views: also compact the views and clean up old view indexes of compacted databases
+        """
+        self.__manager = manager
+        self.__database_names = list(database_names)
+        self.__interval = interval
+        self.__fragmentation_threshold = fragmentation_threshold
+        self.__minimum_disk_size = minimum_disk_size
+        self.__compaction_windows = compaction_windows
+        self.__compaction_cooldown = compaction_cooldown
+        self.__compact_views = compact_views
+        self.__samples = dict((name, collections.deque(maxlen=history)) for name in self.__database_names)
+        self.__compactions = list()
+        self.__last_compaction = dict()
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts sampling on a background thread
+        """
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name="couchdb-health-sampler")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread and waits for the current sample to finish
+        """
+
+        self.__stopped.set()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def sample(self) -> list:
+        """
+        Takes one sample of every database and triggers compaction where required
+
+        :return: A list of the CouchDBHealthSample objects taken, databases that could not be read are left out
+        """
+
+        result = list()
+
+        for database_name in self.__database_names:
+            try:
+                database = self.__manager.retrieve_database(database_name=database_name)
+            except CouchDBError:
+                database = None
+
+            if database is None:
+                continue
+
+            current = CouchDBHealthSample()
+            current.database_name = database_name
+            current.sampled = datetime.datetime.now()
+            current.update_seq = _sequence_number(database.update_seq)
+            current.data_size = database.data_size
+            current.disk_size = database.disk_size
+            current.doc_count = database.doc_count
+            current.doc_del_count = database.doc_del_count
+            current.compact_running = database.compact_running
+            current.write_rate = None
+            current.fragmentation = None
+
+            if current.disk_size:
+                current.fragmentation = max(0.0, (current.disk_size - current.data_size) / current.disk_size)
+
+            with self.__lock:
+                history = self.__samples[database_name]
+
+                if len(history) > 0:
+                    previous = history[-1]
+                    elapsed = (current.sampled - previous.sampled).total_seconds()
+
+                    if elapsed > 0:
+                        current.write_rate = (current.update_seq - previous.update_seq) / elapsed
+
+                history.append(current)
+
+            self.__compact_if_required(current)
+            result.append(current)
+
+        return result
+
+    def retrieve_samples(self, database_name: string=None) -> list:
+        """
+        Retrieves the sample history of a database, oldest first
+
+        :param database_name: A string representation of the database name in CouchDB
+        :return: A list of CouchDBHealthSample objects
+        """
+
+        with self.__lock:
+            return list(self.__samples.get(database_name, list()))
+
+    def retrieve_compactions(self) -> list:
+        """
+        Retrieves the compactions started by this sampler
+
+        :return: A list of (datetime, database name, fragmentation) tuples
+        """
+
+        with self.__lock:
+            return list(self.__compactions)
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            # a failed sample or compaction, such as a 401 for a non-admin user, must not end the sampling
+            try:
+                self.sample()
+            except (CouchDBError, requests.RequestException):
+                pass
+
+            self.__stopped.wait(self.__interval)
+
+    def __compact_if_required(self, current: CouchDBHealthSample=None):
+        if self.__fragmentation_threshold is None or current.fragmentation is None:
+            return
+        if current.compact_running or current.fragmentation < self.__fragmentation_threshold:
+            return
+        if current.disk_size < self.__minimum_disk_size or not self.__in_compaction_window(current.sampled):
+            return
+
+        last_compaction = self.__last_compaction.get(current.database_name)
+
+        if last_compaction is not None and \
+                (current.sampled - last_compaction).total_seconds() < self.__compaction_cooldown:
+            return
+
+        database_name = current.database_name
+
+        if not self.__manager.compact_database(database_name=database_name):
+            return
+
+        if self.__compact_views:
+            for design_document in self.__manager.retrieve_design_documents(database_name=database_name):
+                self.__manager.compact_view(database_name=database_name, design_document=design_document)
+
+            self.__manager.cleanup_views(database_name=database_name)
+
+        with self.__lock:
+            self.__last_compaction[database_name] = current.sampled
+            self.__compactions.append((current.sampled, database_name, current.fragmentation))
+
+    def __in_compaction_window(self, moment: datetime.datetime=None) -> bool:
+        if self.__compaction_windows is None:
+            return True
+
+        now = moment.time()
+
+        for start, end in self.__compaction_windows:
+            if start <= end and start <= now < end:
+                return True
+            # windows such as 22:00 to 04:00 run over midnight
+            if start > end and (now >= start or now < end):
+                return True
+
+        return False
+
+
+class CouchDBLocalReplica(object):
+    """
+    Keeps a local copy of a database, bootstrapped from _all_docs and kept current from the _changes feed, so
+    reads never leave the process. Documents are stored in SQLite, on disk or in memory, with secondary indexes on
+    chosen fields for simple lookups.
+    """
+
+    __manager = None
+    __database_name = string
+    __indexes = list
+    __codecs = None
+    __batch_size = int
+    __poll_timeout = int
+    __connection = None
+    __lock = None
+    __stopped = None
+    __thread = None
+    __last_synced = datetime
+
+    def __init__(self,
+                 manager: NativeCouchDBManager=None,
+                 database_name: string=None,
+                 path: string=":memory:",
+                 indexes: list=None,
+                 codecs: CouchDBCodecRegistry=None,
+                 batch_size: int=1000,
+                 poll_timeout: int=30000):
+        """
+        Initializes the local replica, an on disk replica resumes from the sequence it last stored
+
+        :param manager: the manager used to reach CouchDB
+        :param database_name: the name of the database to replicate
+        :param path: the SQLite database file, :memory: to keep the replica in memory
+        :param indexes: a list of dotted field paths to index for find
+        :param codecs: the codec registry used to decode documents, defaults to default_codec_registry
+        :param batch_size: the number of documents read per request while bootstrapping and following changes
+        :param poll_timeout: the number of milliseconds each longpoll request for changes waits
+        """
+        self.__manager = manager
+        self.__database_name = database_name
+        self.__indexes = list() if indexes is None else list(indexes)
+        self.__codecs = default_codec_registry if codecs is None else codecs
+        self.__batch_size = batch_size
+        self.__poll_timeout = poll_timeout
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__last_synced = None
+
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, rev TEXT, body TEXT)")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS fields (name TEXT, value TEXT, id TEXT)")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS fields_value ON fields (name, value)")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS fields_id ON fields (id)")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.__connection.commit()
+
+    def bootstrap(self):
+        """
+        Copies every document through _all_docs unless the replica already holds a sequence to resume from
+        """
+
+        if self.__retrieve_meta("seq") is not None:
+            return
+
+        # the sequence is read first, so changes made during the copy are replayed afterwards
+        database = self.__manager.retrieve_database(database_name=self.__database_name)
+        batch = list()
+
+        if database is None:
+            return
+
+        for row in self.__manager.iterate_all_documents(database_name=self.__database_name,
+                                                        include_docs=True,
+                                                        page_size=self.__batch_size):
+            batch.append(row["doc"])
+
+            if len(batch) >= self.__batch_size:
+                self.__apply(batch, list())
+                batch = list()
+
+        self.__apply(batch, list(), seq=database.update_seq)
+
+    def sync(self) -> int:
+        """
+        Applies the changes made since the last stored sequence, waiting for up to the poll timeout if none
+
+        :return: The number of changes applied, None if the changes could not be read
+        """
+
+        changes = self.__manager.retrieve_changes(database_name=self.__database_name,
+                                                  since=self.__retrieve_meta("seq"),
+                                                  limit=self.__batch_size,
+                                                  include_docs=True,
+                                                  feed="longpoll",
+                                                  timeout=self.__poll_timeout)
+
+        if changes is None:
+            return None
+
+        updated = [change["doc"] for change in changes["results"] if not change.get("deleted")]
+        deleted = [change["id"] for change in changes["results"] if change.get("deleted")]
+        self.__apply(updated, deleted, seq=changes["last_seq"])
+
+        return len(changes["results"])
+
+    def start(self):
+        """
+        Bootstraps the replica if required and follows the changes feed on a background thread
+        """
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name="couchdb-local-replica")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stops following the changes feed, waiting for the current longpoll request to return
+        """
+
+        self.__stopped.set()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def retrieve_document(self, database_name: string=None, doc_id: string=None) -> CouchDBDocument:
+        """
+        Retrieves a document from the replica
+
+        :param database_name: A string representation of the database name, None or the replicated database
+        :param doc_id: A string representation of the document ID to be retrieved
+        :return: Returns a populated CouchDBDocument if found, None otherwise
+        """
+
+        if database_name is not None and database_name != self.__database_name:
+            return None
+
+        with self.__lock:
+            row = self.__connection.execute("SELECT body FROM documents WHERE id = ?", (doc_id,)).fetchone()
+
+        return None if row is None else self.__to_document(row[0])
+
+    def find(self, field: string=None, value: object=None) -> list:
+        """
+        Retrieves the documents whose indexed field equals a value
+
+        :param field: the dotted path of an indexed field
+        :param value: the value to match
+        :return: A list of populated CouchDBDocument objects
+        """
+
+        if field not in self.__indexes:
+            raise ValueError("Field is not indexed : " + field)
+
+        with self.__lock:
+            rows = self.__connection.execute("SELECT d.body FROM fields f JOIN documents d ON d.id = f.id "
+                                             "WHERE f.name = ? AND f.value = ?",
+                                             (field, json.dumps(value, sort_keys=True))).fetchall()
+
+        return [self.__to_document(row[0]) for row in rows]
+
+    def retrieve_seq(self) -> object:
+        """
+        Retrieves the sequence the replica is current to
+
+        :return: The last applied sequence, None before the bootstrap
+        """
+
+        return self.__retrieve_meta("seq")
+
+    def retrieve_seq_lag(self) -> int:
+        """
+        Retrieves how many updates the replica is behind the database
+
+        :return: The difference between the database update_seq and the replica sequence, None if unknown
+        """
+
+        seq = self.__retrieve_meta("seq")
+        database = self.__manager.retrieve_database(database_name=self.__database_name)
+
+        if seq is None or database is None:
+            return None
+
+        return max(0, _sequence_number(database.update_seq) - _sequence_number(seq))
+
+    def __get_last_synced(self) -> datetime:
+        return self.__last_synced
+
+    last_synced = property(__get_last_synced)
+
+    def __run(self):
+        delay = 1.0
+
+        while not self.__stopped.is_set():
+            # any failure, a missing database or an unexpected change alike, backs off instead of retrying at once
+            try:
+                self.bootstrap()
+                applied = self.sync()
+            except Exception:
+                applied = None
+
+            if applied is None:
+                self.__stopped.wait(delay)
+                delay = min(delay * 2, 60.0)
+            else:
+                self.__last_synced = datetime.datetime.now()
+                delay = 1.0
+
+    def __apply(self, updated: list=None, deleted: list=None, seq: object=None):
+        with self.__lock:
+            connection = self.__connection
+            ids = [(document["_id"],) for document in updated] + [(doc_id,) for doc_id in deleted]
+
+            connection.executemany("DELETE FROM fields WHERE id = ?", ids)
+            connection.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in deleted])
+            connection.executemany("INSERT OR REPLACE INTO documents (id, rev, body) VALUES (?, ?, ?)",
+                                   [(d["_id"], d["_rev"], json.dumps(d)) for d in updated])
+            connection.executemany("INSERT INTO fields (name, value, id) VALUES (?, ?, ?)",
+                                   [(field, json.dumps(value, sort_keys=True), d["_id"]) for d in updated
+                                    for field, value in self.__indexed_values(d)])
+
+            if seq is not None:
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seq', ?)", (json.dumps(seq),))
+
+            connection.commit()
+
+    def __indexed_values(self, document: dict=None):
+        for field in self.__indexes:
+            value = document
+
+            for name in field.split("."):
+                value = value.get(name) if isinstance(value, dict) else None
+
+            if value is not None:
+                yield field, value
+
+    def __retrieve_meta(self, key: string=None) -> object:
+        with self.__lock:
+            row = self.__connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+    def __to_document(self, body: string=None) -> CouchDBDocument:
+        json_result = json.loads(body)
+        cb_doc = CouchDBDocument()
+        cb_doc.id = json_result["_id"]
+        cb_doc.rev = json_result["_rev"]
+        cb_doc.json = json_result
+        cb_doc.value = self.__codecs.decode(json_result)
+
+        return cb_doc
+
+
+def main(argv: list=None) -> int:
+    """
+    Command line entry point, run as python -m couchdb
+
+    :param argv: A list of command line arguments, defaults to sys.argv
+    :return: The process exit code
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m couchdb", description="Native Python CouchDB client tools")
+    parser.add_argument("--host", default="127.0.0.1", help="the ip address of the couch db server")
+    parser.add_argument("--port", default=5984, type=int, help="the port of the couch db server")
+    parser.add_argument("--user", default=None, help="the user to use when accessing the database")
+    parser.add_argument("--password", default=None, help="the password for the user")
+    parser.add_argument("--auth-method", default="basic", choices=("basic", "cookie"),
+                        help="send the credentials with every request or log in once through _session")
+    commands = parser.add_subparsers(dest="command")
+
+    export_parser = commands.add_parser("export", help="export a database to compressed NDJSON shard files")
+    export_parser.add_argument("database")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--shards", default=4, type=int)
+    export_parser.add_argument("--workers", default=4, type=int)
+    export_parser.add_argument("--page-size", default=1000, type=int)
+    export_parser.add_argument("--attachments", action="store_true")
+    export_parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of a previous run")
+
+    import_parser = commands.add_parser("import", help="import NDJSON shard files written by export")
+    import_parser.add_argument("database")
+    import_parser.add_argument("directory")
+    import_parser.add_argument("--source", default=None, help="the exported database name, defaults to database")
+    import_parser.add_argument("--workers", default=4, type=int)
+    import_parser.add_argument("--batch-size", default=500, type=int)
+    import_parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of a previous run")
+
+    replay_parser = commands.add_parser("replay", help="replay a workload recorded by CouchDBRecorder against --host")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--speed", default=1.0, type=float, help="the pacing multiplier, 0 for max speed")
+    replay_parser.add_argument("--concurrency", default=4, type=int)
+
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    if args.command == "replay":
+        replayer = CouchDBReplayer(path=args.recording,
+                                   target="http://" + args.host + ":" + str(args.port),
+                                   speed=args.speed if args.speed > 0 else None,
+                                   concurrency=args.concurrency,
+                                   user=args.user,
+                                   password=args.password)
+        result = replayer.replay()
+        sys.stdout.write(json.dumps(result, indent="\t", sort_keys=True) + "\n")
+
+        return 0 if result["failed"] == 0 else 1
+
+    manager = NativeCouchDBManager(db_user=args.user,
+                                   db_password=args.password,
+                                   db_host_ip=args.host,
+                                   db_host_port=args.port,
+                                   db_auth_method=args.auth_method,
+                                   db_throw_errors=True)
+
+    def report(shard, count):
+        sys.stderr.write("shard %d: %d documents\n" % (shard, count))
+
+    try:
+        if args.command == "export":
+            result = manager.export_database(database_name=args.database,
+                                             directory=args.directory,
+                                             shards=args.shards,
+                                             workers=args.workers,
+                                             attachments=args.attachments,
+                                             page_size=args.page_size,
+                                             resume=not args.restart,
+                                             progress=report)
+        else:
+            result = manager.import_database(database_name=args.database,
+                                             directory=args.directory,
+                                             source_database_name=args.source,
+                                             workers=args.workers,
+                                             batch_size=args.batch_size,
+                                             resume=not args.restart,
+                                             progress=report)
+    except CouchDBError as e:
+        sys.stderr.write("%s %s\n" % (e.title, e.description))
+        return 1
+
+    sys.stdout.write(json.dumps(result, indent="\t", sort_keys=True) + "\n")
+
+    return 0 if result["complete"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())